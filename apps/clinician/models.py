@@ -1,5 +1,7 @@
 import uuid
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.contrib.postgres.fields import ArrayField
 from django.utils import timezone
 from datetime import timedelta
@@ -62,6 +64,13 @@ class ClinicianAvailability(models.Model):
             return can_accept
         except ClinicianProfile.DoesNotExist:
             return False
+    
+    @classmethod
+    def release_patients(cls, clinician, count=1):
+        """Give back `count` patient slots taken when assignments were made."""
+        cls.objects.filter(clinician=clinician).update(
+            current_patient_count=Greatest(F('current_patient_count') - count, 0)
+        )
 
 
 class PatientAssignment(models.Model):
@@ -115,9 +124,24 @@ class PatientAssignment(models.Model):
     
     def mark_completed(self):
         """Mark assignment as completed."""
+        was_active = self.status == 'ACTIVE'
         self.status = 'COMPLETED'
         self.completed_at = timezone.now()
-        self.save()
+        self.save(update_fields=['status', 'completed_at'])
+        if was_active and self.clinician_id:
+            ClinicianAvailability.release_patients(self.clinician_id)
+    
+    @classmethod
+    def complete_for_conversation(cls, conversation):
+        """Complete the conversation's active assignments and free their slots."""
+        active = cls.objects.filter(conversation=conversation, status='ACTIVE')
+        for pk, clinician_id in list(active.values_list('pk', 'clinician_id')):
+            # Conditional update, so a concurrent close can't release twice
+            closed = cls.objects.filter(pk=pk, status='ACTIVE').update(
+                status='COMPLETED', completed_at=timezone.now()
+            )
+            if closed and clinician_id:
+                ClinicianAvailability.release_patients(clinician_id)
 
 
 class ClinicianAction(models.Model):
@@ -230,4 +254,4 @@ class ModificationSession(models.Model):
         """Mark session as completed."""
         self.status = 'COMPLETED'
         self.completed_at = timezone.now()
-        self.save()
\ No newline at end of file
+        self.save(update_fields=['status', 'completed_at', 'updated_at'])
\ No newline at end of file
@@ -66,7 +66,10 @@ class AssessmentDetailSerializer(serializers.ModelSerializer):
         return str(obj.conversation.id)
     
     def get_messages(self, obj):
-        messages = obj.conversation.messages.all()
+        # Last 5 messages, newest-first off the (conversation, created_at) index
+        messages = obj.conversation.messages.select_related('sender').only(
+            'content', 'created_at', 'message_type', 'sender__phone_number'
+        ).order_by('-created_at')[:5]
         return [
             {
                 'sender': msg.sender.phone_number if msg.sender else 'System',
@@ -74,7 +77,7 @@ class AssessmentDetailSerializer(serializers.ModelSerializer):
                 'timestamp': msg.created_at.isoformat(),
                 'type': msg.message_type
             }
-            for msg in messages[-5:]  # Last 5 messages
+            for msg in reversed(messages)
         ]
 
 
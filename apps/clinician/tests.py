@@ -1,3 +1,67 @@
+from unittest import mock
+
+from django.db.models.query import QuerySet
 from django.test import TestCase
 
-# Create your tests here.
+from apps.authentication.models import User
+from apps.clinician.models import ClinicianAvailability, PatientAssignment
+from apps.conversations.models import ConversationSession
+from services.workflow_service import _assign_clinician
+
+
+class AssignClinicianTests(TestCase):
+
+    def setUp(self):
+        self.patient = User.objects.create(username='patient', phone_number='+2348000000001')
+        self.conversation = ConversationSession.objects.create(patient=self.patient)
+        patcher = mock.patch('services.workflow_service.get_clinician_handler')
+        self.handler = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _clinician(self, phone_number, patient_count=0, status='AVAILABLE'):
+        clinician = User.objects.create(username=phone_number, phone_number=phone_number, role='CLINICIAN')
+        ClinicianAvailability.objects.create(
+            clinician=clinician, status=status, current_patient_count=patient_count,
+        )
+        return clinician
+
+    def test_assigns_least_loaded_clinician(self):
+        self._clinician('+2348000000002', patient_count=3)
+        least_loaded = self._clinician('+2348000000003', patient_count=1)
+        self._clinician('+2348000000004', patient_count=0, status='OFFLINE')
+
+        _assign_clinician(self.conversation)
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.assigned_clinician, least_loaded)
+        self.assertEqual(ClinicianAvailability.objects.get(clinician=least_loaded).current_patient_count, 2)
+        assignment = PatientAssignment.objects.get(conversation=self.conversation)
+        self.assertEqual(assignment.clinician, least_loaded)
+        self.handler.return_value.notify_new_patient.assert_called_once_with(least_loaded, self.conversation)
+
+    def test_waits_for_a_locked_clinician_when_all_are_locked(self):
+        clinician = self._clinician('+2348000000002')
+        first = QuerySet.first
+
+        def first_unless_skip_locked(queryset):
+            # Behave as if every candidate row were locked by another assignment
+            if queryset.query.select_for_update_skip_locked:
+                return None
+            return first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', autospec=True, side_effect=first_unless_skip_locked) as patched:
+            _assign_clinician(self.conversation)
+
+        self.assertEqual(patched.call_count, 2)
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.assigned_clinician, clinician)
+
+    def test_no_available_clinician_leaves_conversation_unassigned(self):
+        self._clinician('+2348000000002', status='OFFLINE')
+
+        _assign_clinician(self.conversation)
+
+        self.conversation.refresh_from_db()
+        self.assertIsNone(self.conversation.assigned_clinician)
+        self.assertFalse(PatientAssignment.objects.exists())
+        self.handler.return_value.notify_new_patient.assert_not_called()
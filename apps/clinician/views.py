@@ -88,7 +88,7 @@ class ClinicianDashboardViewSet(viewsets.ViewSet):
             return Response(dashboard, status=status.HTTP_200_OK)
         
         except Exception as e:
-            print(f"Error in dashboard: {str(e)}")
+            logger.error("Error in dashboard: %s", e)
             return Response(
                 {'error': 'Failed to load dashboard'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -116,7 +116,7 @@ class ClinicianDashboardViewSet(viewsets.ViewSet):
             })
         
         except Exception as e:
-            print(f"Error getting queue: {str(e)}")
+            logger.error("Error getting queue: %s", e)
             return Response(
                 {'error': 'Failed to load queue'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -150,7 +150,7 @@ class ClinicianDashboardViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            print(f"Error getting assessment: {str(e)}")
+            logger.error("Error getting assessment: %s", e)
             return Response(
                 {'error': 'Failed to load assessment'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -208,8 +208,8 @@ class ClinicianDashboardViewSet(viewsets.ViewSet):
             
             # Send WhatsApp notification to clinician
             try:
-                from apps.clinician.whatsapp_handler import ClinicianWhatsAppHandler
-                handler = ClinicianWhatsAppHandler()
+                from apps.clinician.whatsapp_handler import get_clinician_handler
+                handler = get_clinician_handler()
                 
                 if action_type == 'APPROVED':
                     handler.twilio.send_message(
@@ -226,7 +226,7 @@ class ClinicianDashboardViewSet(viewsets.ViewSet):
                         f"(to send modified version)"
                     )
             except Exception as e:
-                print(f"Error notifying: {str(e)}")
+                logger.error("Error notifying: %s", e)
             
             serializer = AssessmentReviewSerializer(review)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -237,7 +237,7 @@ class ClinicianDashboardViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            print(f"Error reviewing assessment: {str(e)}")
+            logger.error("Error reviewing assessment: %s", e)
             return Response(
                 {'error': 'Failed to review assessment'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -307,7 +307,7 @@ class ClinicianDashboardViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            print(f"Error sending assessment: {str(e)}")
+            logger.error("Error sending assessment: %s", e)
             return Response(
                 {'error': 'Failed to send assessment'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -363,7 +363,7 @@ class ClinicianDashboardViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            print(f"Error sending message: {str(e)}")
+            logger.error("Error sending message: %s", e)
             return Response(
                 {'error': 'Failed to send message'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -388,7 +388,7 @@ class ClinicianDashboardViewSet(viewsets.ViewSet):
             return Response(serializer.data, status=status.HTTP_200_OK)
         
         except Exception as e:
-            print(f"Error updating availability: {str(e)}")
+            logger.error("Error updating availability: %s", e)
             return Response(
                 {'error': 'Failed to update availability'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -417,7 +417,7 @@ class ClinicianDashboardViewSet(viewsets.ViewSet):
             ])
         
         except Exception as e:
-            print(f"Error getting escalations: {str(e)}")
+            logger.error("Error getting escalations: %s", e)
             return Response(
                 {'error': 'Failed to load escalations'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -129,7 +129,7 @@ class ClinicianWhatsAppHandler:
                 return True
             
         except Exception as e:
-            print(f"[CLINICIAN] Error: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error: %s", e, exc_info=True)
             return False
         
     # COMMAND: HELP
@@ -223,7 +223,7 @@ Type *help* anytime for this message."""
             logger.info(f"[CLINICIAN] Sent pending list to {clinician.phone_number}")
         
         except Exception as e:
-            print(f"[CLINICIAN] Error in pending: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error in pending: %s", e, exc_info=True)
             self._send_to_clinician(clinician, "Error loading pending assessments")
             
     # COMMAND: ESCALATIONS
@@ -257,7 +257,7 @@ Type *help* anytime for this message."""
             logger.info(f"[CLINICIAN] Sent escalations to {clinician.phone_number}")
         
         except Exception as e:
-            print(f"[CLINICIAN] Error in escalations: {str(e)}")
+            logger.error("[CLINICIAN] Error in escalations: %s", e)
             self._send_to_clinician(clinician, "Error loading escalations")
     
    
@@ -296,7 +296,7 @@ Type *help* anytime for this message."""
             logger.info(f"[CLINICIAN] Sent patients to {clinician.phone_number}")
         
         except Exception as e:
-            print(f"[CLINICIAN] Error in patients: {str(e)}")
+            logger.error("[CLINICIAN] Error in patients: %s", e)
             self._send_to_clinician(clinician, "Error loading patients")
     
     
@@ -366,7 +366,7 @@ Type *help* anytime for this message."""
             return True
         
         except AIAssessment.DoesNotExist:
-            print(f"[CLINICIAN] Assessment not found: {args}")
+            logger.warning("[CLINICIAN] Assessment not found: %s", args)
             self.twilio.send_message(
                 clinician.whatsapp_id,
                 "Assessment not found\n\n"
@@ -376,7 +376,7 @@ Type *help* anytime for this message."""
             return False
         
         except Exception as e:
-            print(f"[CLINICIAN] Error in approve: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error in approve: %s", e, exc_info=True)
             self._send_to_clinician(clinician, "Error approving assessment")
             return False
     
@@ -446,7 +446,7 @@ Type *help* anytime for this message."""
             return False
         
         except Exception as e:
-            print(f"[CLINICIAN] Error in reject: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error in reject: %s", e, exc_info=True)
             self._send_to_clinician(clinician, "Error rejecting assessment")
             return False
     
@@ -516,7 +516,7 @@ Type *help* anytime for this message."""
                 return self._finalize_send_to_patient(clinician, assessment, None)
         
         except AIAssessment.DoesNotExist:
-            print(f"[CLINICIAN] Assessment not found: {args}")
+            logger.warning("[CLINICIAN] Assessment not found: %s", args)
             self.twilio.send_message(
                 clinician.whatsapp_id,
                 "Assessment not found\n\nCheck: pending"
@@ -524,7 +524,7 @@ Type *help* anytime for this message."""
             return False
         
         except Exception as e:
-            print(f"[CLINICIAN] Error in send: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error in send: %s", e, exc_info=True)
             self.twilio.send_message(clinician.whatsapp_id, "Error sending assessment")
             return False
     
@@ -772,7 +772,7 @@ Type *help* anytime for this message."""
             return True
         
         except Exception as e:
-            print(f"[CLINICIAN] Error in finalize_send: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error in finalize_send: %s", e, exc_info=True)
             self.twilio.send_message(clinician.whatsapp_id, "Error sending assessment")
             return False
     
@@ -825,7 +825,7 @@ Type *help* anytime for this message."""
 
             # 3. If still not found, fail
             if not conversation:
-                print(f"[CLINICIAN] ID not found: {input_id}")
+                logger.warning("[CLINICIAN] ID not found: %s", input_id)
                 self.twilio.send_message(
                     clinician.whatsapp_id,
                     f"Context not found for ID: {input_id}\n"
@@ -865,7 +865,7 @@ Type *help* anytime for this message."""
             return True
         
         except Exception as e:
-            print(f"[CLINICIAN] Error in message: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error in message: %s", e, exc_info=True)
             self._send_to_clinician(clinician, "Error sending message")
             return False
     
@@ -915,11 +915,7 @@ Type *help* anytime for this message."""
             conversation.save()
 
             # 2. Close Patient Assignment (Remove from Active List)
-            PatientAssignment.objects.filter(
-                conversation=conversation,
-                clinician=clinician,
-                status='ACTIVE'
-            ).update(status='COMPLETED')
+            PatientAssignment.complete_for_conversation(conversation)
 
             # 3. Update Availability (if needed)
             availability, _ = ClinicianAvailability.objects.get_or_create(
@@ -949,7 +945,7 @@ Type *help* anytime for this message."""
             return True
 
         except Exception as e:
-            print(f"[CLINICIAN] Error closing session: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error closing session: %s", e, exc_info=True)
             self._send_to_clinician(clinician, "Error closing session")
             return False
    
@@ -1017,7 +1013,7 @@ Type *help* anytime for this message."""
             return True
         
         except Exception as e:
-            print(f"[CLINICIAN] Error in status: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error in status: %s", e, exc_info=True)
             self._send_to_clinician(clinician, "Error updating status")
             return False
     
@@ -1117,7 +1113,7 @@ Type *help* anytime for this message."""
             return False
         
         except Exception as e:
-            print(f"[CLINICIAN] Error starting modify: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error starting modify: %s", e, exc_info=True)
             self.twilio.send_message(
                 clinician.whatsapp_id,
                 "Error starting modification"
@@ -1429,7 +1425,7 @@ Type *help* anytime for this message."""
             return True
         
         except Exception as e:
-            print(f"[CLINICIAN] Error in modification workflow: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error in modification workflow: %s", e, exc_info=True)
             self.twilio.send_message(clinician.whatsapp_id, "Error processing response")
             return False
     
@@ -1478,7 +1474,7 @@ Type *help* anytime for this message."""
             return True
         
         except Exception as e:
-            print(f"[CLINICIAN] Error finalizing: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error finalizing: %s", e, exc_info=True)
             self.twilio.send_message(clinician.whatsapp_id, "Error saving modifications")
             return False
     
@@ -1579,7 +1575,7 @@ Type *help* anytime for this message."""
                 logger.warning(f"[CLINICIAN] Not found: {whatsapp_id}")
             return user
         except Exception as e:
-            print(f"[CLINICIAN] Error looking up clinician: {str(e)}")
+            logger.error("[CLINICIAN] Error looking up clinician: %s", e)
             return None
 
     def _send_to_clinician(self, clinician, message):
@@ -1588,7 +1584,7 @@ Type *help* anytime for this message."""
             to_whatsapp = clinician.whatsapp_id or clinician.phone_number
             self.twilio.send_message(to_whatsapp, message)
         except Exception as e:
-            print(f"[CLINICIAN] Error sending: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error sending: %s", e, exc_info=True)
     
     def _format_assessment_message_for_patient(self, assessment, clinician, final_recs, final_meds, final_monitoring, notes):
         """Format assessment as beautiful WhatsApp message for patient."""
@@ -1644,7 +1640,7 @@ Type *help* anytime for this message."""
             return message
         
         except Exception as e:
-            print(f"[CLINICIAN] Error formatting message: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error formatting message: %s", e, exc_info=True)
             return "Assessment sent to patient"
     
     #  VALIDATION ISSUES FORMATTER 
@@ -1833,7 +1829,7 @@ Type *help* anytime for this message."""
             logger.info(f"[CLINICIAN] Notified new patient: {clinician.phone_number}")
         
         except Exception as e:
-            print(f"[CLINICIAN] Error notifying: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error notifying: %s", e, exc_info=True)
 
 
     def notify_patient_message(self, clinician, conversation, patient_message):
@@ -1854,7 +1850,7 @@ Type *help* anytime for this message."""
             logger.info(f"[CLINICIAN] Notified about patient message: {clinician.phone_number}")
         
         except Exception as e:
-            print(f"[CLINICIAN] Error notifying: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error notifying: %s", e, exc_info=True)
 
     
     def notify_escalation(self, clinician, escalation):
@@ -1874,7 +1870,7 @@ Type *help* anytime for this message."""
             logger.info(f"[CLINICIAN] Notified escalation: {clinician.phone_number}")
         
         except Exception as e:
-            print(f"[CLINICIAN] Error notifying escalation: {str(e)}")
+            logger.error("[CLINICIAN] Error notifying escalation: %s", e)
             
     def _handle_modify(self, clinician, args):
         """
@@ -1933,7 +1929,7 @@ Type *help* anytime for this message."""
             return False
         
         except Exception as e:
-            print(f"[CLINICIAN] Error in modify: {str(e)}", exc_info=True)
+            logger.error("[CLINICIAN] Error in modify: %s", e, exc_info=True)
             self.twilio.send_message(clinician.whatsapp_id, "Error")
             return False
         
@@ -2046,4 +2042,15 @@ Type *help* anytime for this message."""
             return None
         except Exception as e:
             logger.error(f"[PDF] Error saving prescription record: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+
+_handler = None
+
+
+def get_clinician_handler():
+    """Return the process-wide ClinicianWhatsAppHandler, creating it on first use."""
+    global _handler
+    if _handler is None:
+        _handler = ClinicianWhatsAppHandler()
+    return _handler
@@ -1,4 +1,5 @@
 import uuid
+from django.core.cache import cache
 from django.db import models
 from django.contrib.postgres.fields import ArrayField
 from apps.authentication.models import User
@@ -21,6 +22,13 @@ class ConversationSession(models.Model):
         ('ESCALATED', 'Escalated'),
     ]
     
+    # Statuses in which an incoming patient message continues this session
+    ACTIVE_STATUSES = (
+        'INITIAL', 'AWAITING_ACCEPTANCE', 'AWAITING_PATIENT_PROFILE',
+        'AI_TRIAGE_IN_PROGRESS', 'PENDING_PAYMENT', 'PENDING_CLINICIAN_REVIEW', 'DIRECT_MESSAGING',
+    )
+    ACTIVE_CACHE_TIMEOUT = 60 * 60
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_sessions')
     assigned_clinician = models.ForeignKey(
@@ -54,6 +62,19 @@ class ConversationSession(models.Model):
     def __str__(self):
         return f"Conversation {self.id} - {self.patient.phone_number} - {self.status}"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Write-through cache of the patient's active session id
+        key = self.active_cache_key(self.patient_id)
+        if self.status in self.ACTIVE_STATUSES:
+            cache.set(key, self.id, self.ACTIVE_CACHE_TIMEOUT)
+        elif cache.get(key) == self.id:
+            cache.delete(key)
+    
+    @staticmethod
+    def active_cache_key(patient_id):
+        return f"conv:active:{patient_id}"
+    
     def is_active(self):
         """Check if conversation is still active."""
         return self.status not in ['CLOSED', 'ESCALATED']
@@ -1,3 +1,103 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase
+
+from apps.audit.models import AuditLog
+from apps.authentication.models import User
+from apps.conversations.models import ConversationSession, Message
+from services import tasks
+from services.message_handler import MessageHandler, _pending_writes
+
+
+class EnqueueIncomingMessageTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(tasks.handle_incoming_message, 'apply_async')
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_routes_voice_notes_to_transcription_queue(self):
+        data = {'MessageSid': 'SM1', 'MediaUrl0': 'https://api.twilio.com/media/1'}
+
+        self.assertTrue(tasks.enqueue_incoming_message(data))
+        self.apply_async.assert_called_once_with(args=[data], queue='whatsapp_transcription')
+
+    def test_drops_redelivered_message_sid(self):
+        data = {'MessageSid': 'SM1', 'Body': 'hello'}
+
+        self.assertTrue(tasks.enqueue_incoming_message(data))
+        self.assertFalse(tasks.enqueue_incoming_message(data))
+        self.apply_async.assert_called_once_with(args=[data], queue='whatsapp_incoming')
+
+    def test_messages_without_sid_are_always_queued(self):
+        data = {'Body': 'hello'}
+
+        self.assertTrue(tasks.enqueue_incoming_message(data))
+        self.assertTrue(tasks.enqueue_incoming_message(data))
+        self.assertEqual(self.apply_async.call_count, 2)
+
+    def test_releases_sid_when_queueing_fails(self):
+        data = {'MessageSid': 'SM1', 'Body': 'hello'}
+        self.apply_async.side_effect = ConnectionError("broker down")
+
+        with self.assertRaises(ConnectionError):
+            tasks.enqueue_incoming_message(data)
+
+        self.apply_async.side_effect = None
+        self.assertTrue(tasks.enqueue_incoming_message(data))
+
+
+class FlushWritesTests(TestCase):
+
+    def setUp(self):
+        self.handler = MessageHandler.__new__(MessageHandler)
+        self.user = User.objects.create(username='patient', phone_number='+2348000000001')
+        self.conversation = ConversationSession.objects.create(patient=self.user)
+        self.addCleanup(setattr, _pending_writes, 'objects', None)
+
+    def _message(self, content):
+        return Message(
+            conversation=self.conversation,
+            sender=self.user,
+            message_type='PATIENT',
+            content=content,
+        )
+
+    def _audit(self):
+        return AuditLog(
+            user=self.user,
+            action_type='MESSAGE_RECEIVED',
+            resource_type='Message',
+            description="Patient sent message",
+        )
+
+    def test_defer_create_saves_immediately_outside_a_webhook(self):
+        self.handler._defer_create(self._message("hello"))
+
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_inserts_queued_rows(self):
+        _pending_writes.objects = []
+        self.handler._defer_create(self._message("hello"))
+        self.handler._defer_create(self._audit())
+        self.handler._defer_create(self._message("still here"))
+        self.assertEqual(Message.objects.count(), 0)
+
+        self.handler._flush_writes()
+
+        self.assertEqual(Message.objects.count(), 2)
+        self.assertEqual(AuditLog.objects.count(), 1)
+        self.assertIsNone(_pending_writes.objects)
+
+    def test_failure_propagates_and_rolls_back(self):
+        _pending_writes.objects = [self._audit(), self._message("hello")]
+
+        with mock.patch.object(Message.objects, 'bulk_create', side_effect=DatabaseError("insert failed")):
+            with self.assertRaises(DatabaseError):
+                self.handler._flush_writes()
+
+        self.assertEqual(AuditLog.objects.count(), 0)
+        self.assertIsNone(_pending_writes.objects)
@@ -8,6 +8,7 @@ from rest_framework.permissions import IsAuthenticated
 from apps.authentication.models import User
 from apps.conversations.models import ConversationSession, Message, TriageQuestion
 from apps.assessments.models import AIAssessment
+from apps.clinician.models import PatientAssignment
 from apps.audit.models import AuditLog
 from integrations.twilio.client import TwilioClient
 from .serializers import (
@@ -67,7 +68,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_200_OK)
         
         except Exception as e:
-            print(f"Error listing conversations: {str(e)}")
+            logger.error("Error listing conversations: %s", e)
             return Response(
                 {'error': 'Failed to load conversations'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -99,7 +100,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            print(f"Error retrieving conversation: {str(e)}")
+            logger.error("Error retrieving conversation: %s", e)
             return Response(
                 {'error': 'Failed to load conversation'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -112,14 +113,15 @@ class ConversationViewSet(viewsets.ModelViewSet):
             conversation = self.get_queryset().get(id=pk)
             
             # Get messages ordered by creation time
-            messages = conversation.messages.all().order_by('created_at')
+            messages = conversation.messages.select_related('sender').order_by('created_at')
             
             serializer = MessageSerializer(messages, many=True)
+            data = serializer.data
             
             return Response({
                 'conversation_id': str(pk),
-                'message_count': messages.count(),
-                'messages': serializer.data
+                'message_count': len(data),
+                'messages': data
             }, status=status.HTTP_200_OK)
         
         except ConversationSession.DoesNotExist:
@@ -128,7 +130,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            print(f"Error getting messages: {str(e)}")
+            logger.error("Error getting messages: %s", e)
             return Response(
                 {'error': 'Failed to load messages'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -169,8 +171,8 @@ class ConversationViewSet(viewsets.ModelViewSet):
                     # ========== NOTIFY CLINICIAN ON WHATSAPP ==========
                     if conversation.assigned_clinician:
                         try:
-                            from apps.clinician.whatsapp_handler import ClinicianWhatsAppHandler
-                            handler = ClinicianWhatsAppHandler()
+                            from apps.clinician.whatsapp_handler import get_clinician_handler
+                            handler = get_clinician_handler()
                             handler.notify_patient_message(
                                 conversation.assigned_clinician,
                                 conversation,
@@ -178,7 +180,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
                             )
                             logger.info(f"✅ Notified clinician about patient message")
                         except Exception as e:
-                            print(f"Error notifying clinician: {str(e)}")
+                            logger.error("Error notifying clinician: %s", e)
                     # ================================================
                     
                     return Response({
@@ -196,7 +198,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
                         message.delivery_status = 'SENT'
                         message.save()
                     except Exception as e:
-                        print(f"Error sending to patient: {str(e)}")
+                        logger.error("Error sending to patient: %s", e)
                         message.delivery_status = 'FAILED'
                         message.save()
             # ================================================
@@ -219,7 +221,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            print(f"Error sending message: {str(e)}")
+            logger.error("Error sending message: %s", e)
             return Response(
                 {'error': 'Failed to send message'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -254,7 +256,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            print(f"Error getting triage questions: {str(e)}")
+            logger.error("Error getting triage questions: %s", e)
             return Response(
                 {'error': 'Failed to load triage questions'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -276,6 +278,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
             conversation.status = 'CLOSED'
             conversation.closed_at = timezone.now()
             conversation.save()
+            PatientAssignment.complete_for_conversation(conversation)
             
             # Log action
             AuditLog.objects.create(
@@ -297,7 +300,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            print(f"Error closing conversation: {str(e)}")
+            logger.error("Error closing conversation: %s", e)
             return Response(
                 {'error': 'Failed to close conversation'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -329,7 +332,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            print(f"Error getting assessment: {str(e)}")
+            logger.error("Error getting assessment: %s", e)
             return Response(
                 {'error': 'Failed to load assessment'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -103,7 +103,7 @@ class EscalationAlert(models.Model):
         self.acknowledged_at = timezone.now()
         if by_user:
             self.handled_by = by_user
-        self.save()
+        self.save(update_fields=['alert_status', 'acknowledged_at', 'handled_by'])
     
     def mark_handled(self, by_user=None, notes=''):
         """Mark alert as handled."""
@@ -112,7 +112,7 @@ class EscalationAlert(models.Model):
         self.resolution_notes = notes
         if by_user:
             self.handled_by = by_user
-        self.save()
+        self.save(update_fields=['alert_status', 'handled_at', 'resolution_notes', 'handled_by'])
 
 
 class EscalationHistory(models.Model):
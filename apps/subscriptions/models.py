@@ -1,4 +1,7 @@
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from datetime import timedelta
 from apps.authentication.models import User
@@ -9,9 +12,29 @@ class CreditPackage(models.Model):
     credits = models.IntegerField(default=1)    
     description = models.CharField(max_length=100, blank=True)
 
+    # Packages rarely change but are listed on every payment prompt
+    CACHE_KEY = 'credit_packages_by_price'
+    CACHE_TIMEOUT = 300
+
     def __str__(self):
         return f"{self.name} - {self.credits} Sessions (₦{self.price:,.0f})"
 
+    @classmethod
+    def ordered_by_price(cls):
+        """All packages, cheapest first, served from cache when possible."""
+        return cache.get_or_set(
+            cls.CACHE_KEY,
+            lambda: list(cls.objects.order_by('price')),
+            cls.CACHE_TIMEOUT,
+        )
+
+
+@receiver(post_save, sender=CreditPackage)
+@receiver(post_delete, sender=CreditPackage)
+def invalidate_credit_packages(sender, **kwargs):
+    """Drop the cached package list; post_delete also fires for admin bulk deletes."""
+    cache.delete(CreditPackage.CACHE_KEY)
+
 class PaymentHistory(models.Model):
     """Tracks every payment attempt and success."""
     STATUS_CHOICES = [
@@ -1,3 +1,150 @@
-from django.test import TestCase
+from concurrent.futures import Future
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.test import SimpleTestCase, override_settings
+from groq import APIConnectionError, BadRequestError
+
+from services import groq_service
+from services.groq_service import CircuitBreaker, GroqCircuitOpen, GroqService
+
+
+def _connection_error():
+    return APIConnectionError(request=httpx.Request('POST', 'https://api.groq.com'))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(fail_max=2, reset_timeout=30)
+        self.now = 1000.0
+        patcher = mock.patch.object(groq_service.time, 'monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _fail(self):
+        with self.assertRaises(APIConnectionError):
+            self.breaker.call(mock.Mock(side_effect=_connection_error()))
+
+    def test_opens_after_fail_max_transient_failures(self):
+        self._fail()
+        self.breaker.before_call()
+        self._fail()
+
+        func = mock.Mock()
+        with self.assertRaises(GroqCircuitOpen):
+            self.breaker.call(func)
+        func.assert_not_called()
+
+    def test_non_transient_errors_do_not_count(self):
+        error = BadRequestError(
+            'bad request',
+            response=httpx.Response(400, request=httpx.Request('POST', 'https://api.groq.com')),
+            body=None,
+        )
+        for _ in range(3):
+            with self.assertRaises(BadRequestError):
+                self.breaker.call(mock.Mock(side_effect=error))
+
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+
+    def test_success_resets_the_failure_count(self):
+        self._fail()
+        self.breaker.call(lambda: 'ok')
+        self._fail()
+
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+
+    def test_trial_call_after_reset_timeout_closes_breaker(self):
+        self._fail()
+        self._fail()
+        self.now += 30
+
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+        self.assertEqual(self.breaker.call(lambda: 'again'), 'again')
+
+    def test_failed_trial_call_reopens_breaker(self):
+        self._fail()
+        self._fail()
+        self.now += 30
+        self._fail()
+
+        with self.assertRaises(GroqCircuitOpen):
+            self.breaker.before_call()
+
+
+@override_settings(GROQ_TIMEOUT=0.01, GROQ_MAX_RETRIES=0)
+class CallChatCoalescingTests(SimpleTestCase):
+
+    MESSAGES = [{"role": "user", "content": "Headache for two days"}]
+
+    def setUp(self):
+        groq_service._exact_cache.clear()
+        groq_service._inflight.clear()
+        self.service = GroqService.__new__(GroqService)
+        patcher = mock.patch.object(GroqService, '_create_chat')
+        self.create_chat = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _request_key(self, temperature=0):
+        return groq_service._exact_cache_key(
+            GroqService.PRIMARY_MODEL, self.MESSAGES, GroqService.DEFAULT_MAX_TOKENS,
+            temperature, None, None,
+        )
+
+    def test_follower_gets_leader_result(self):
+        leader = Future()
+        leader.set_result('How severe is it?')
+        groq_service._inflight[self._request_key()] = leader
+
+        self.assertEqual(self.service.call_chat(self.MESSAGES, temperature=0), 'How severe is it?')
+        self.create_chat.assert_not_called()
+
+    def test_follower_reraises_leader_error(self):
+        leader = Future()
+        leader.set_exception(_connection_error())
+        groq_service._inflight[self._request_key()] = leader
+
+        with self.assertRaises(APIConnectionError):
+            self.service.call_chat(self.MESSAGES, temperature=0)
+        self.create_chat.assert_not_called()
+
+    def test_follower_calls_directly_when_leader_times_out(self):
+        groq_service._inflight[self._request_key()] = Future()
+        self.create_chat.return_value = 'Any fever?'
+
+        self.assertEqual(self.service.call_chat(self.MESSAGES, temperature=0), 'Any fever?')
+        self.create_chat.assert_called_once()
+
+    def test_leader_error_is_shared_and_not_cached(self):
+        seen = {}
+
+        def fail(*args):
+            seen['future'] = groq_service._inflight[self._request_key()]
+            raise _connection_error()
+
+        self.create_chat.side_effect = fail
+        with self.assertRaises(APIConnectionError):
+            self.service.call_chat(self.MESSAGES, temperature=0)
+
+        self.assertIsInstance(seen['future'].exception(), APIConnectionError)
+        self.assertEqual(groq_service._inflight, {})
+        self.assertIsNone(groq_service._exact_cache_get(self._request_key()))
+
+    def test_leader_result_is_cached(self):
+        self.create_chat.return_value = 'Any fever?'
+
+        self.service.call_chat(self.MESSAGES, temperature=0)
+        self.service.call_chat(self.MESSAGES, temperature=0)
+
+        self.create_chat.assert_called_once()
+        self.assertEqual(groq_service._inflight, {})
+
+    def test_sampled_calls_are_not_coalesced(self):
+        groq_service._inflight[self._request_key(0.7)] = Future()
+        self.create_chat.return_value = 'Any fever?'
+
+        self.service.call_chat(self.MESSAGES, temperature=0.7)
+        self.service.call_chat(self.MESSAGES, temperature=0.7)
+
+        self.assertEqual(self.create_chat.call_count, 2)
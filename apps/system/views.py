@@ -66,51 +66,18 @@ class TwilioWebhookView(APIView):
             
             logger.info(f"[WEBHOOK] From: {whatsapp_id} | Body: {message_body[:50]}")
             
-            # Step 3: Check if sender is clinician or patient
-            from apps.authentication.models import User
+            # Step 3: Hand off to a worker and acknowledge Twilio right away;
+            # replies go out through the Twilio API, not this response.
+            from services.tasks import enqueue_incoming_message
+            enqueue_incoming_message(incoming_data)
             
-            user = None
-            try:
-                user = User.objects.get(whatsapp_id=whatsapp_id)
-                logger.info(f"[WEBHOOK] Found user: {user.phone_number} | Role: {user.role}")
-            except User.DoesNotExist:
-                logger.info(f"[WEBHOOK] New user (patient): {whatsapp_id}")
-            
-            # Step 4: Route to appropriate handler
-            success = False
-            
-            if user and user.role == 'CLINICIAN':
-                # CLINICIAN MESSAGE
-                logger.info(f"[WEBHOOK] Routing to CLINICIAN handler")
-                
-                from apps.clinician.whatsapp_handler import ClinicianWhatsAppHandler
-                handler = ClinicianWhatsAppHandler()
-                success = handler.process_clinician_message(incoming_data)
-                
-            else:
-                # PATIENT MESSAGE (new or existing patient)
-                logger.info(f"[WEBHOOK] Routing to PATIENT handler")
-                
-                from services.message_handler import MessageHandler
-                handler = MessageHandler()
-                success = handler.process_incoming_message(incoming_data)
-            
-            # Step 5: Return response
-            if success:
-                logger.info(f"[WEBHOOK] Message processed successfully")
-                return Response(
-                    {'status': 'success'},
-                    status=status.HTTP_200_OK
-                )
-            else:
-                print(f"[WEBHOOK] Failed to process message")
-                return Response(
-                    {'status': 'error', 'message': 'Failed to process'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            return Response(
+                {'status': 'accepted'},
+                status=status.HTTP_200_OK
+            )
         
         except Exception as e:
-            print(f"[WEBHOOK] Exception: {str(e)}", exc_info=True)
+            logger.error("[WEBHOOK] Exception: %s", e, exc_info=True)
             return Response(
                 {'status': 'error', 'message': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -143,7 +110,7 @@ class HealthCheckView(APIView):
             return Response(health, status=status.HTTP_200_OK)
         
         except Exception as e:
-            print(f"[HEALTH] Health check failed: {str(e)}")
+            logger.error("[HEALTH] Health check failed: %s", e)
             return Response(
                 {'status': 'unhealthy', 'error': str(e)},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE
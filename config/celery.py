@@ -0,0 +1,53 @@
+"""
+Celery application for background work (slow Groq calls and the outbound
+WhatsApp replies that follow them).
+
+Start a worker with:
+    celery -A config worker -l info -Q celery,whatsapp_incoming,whatsapp_transcription,whatsapp_ai
+
+Incoming messages use the whatsapp_incoming queue, voice notes use
+whatsapp_transcription and assessments use whatsapp_ai (see
+CELERY_TASK_ROUTES), so they can be given separate workers. Whisper and
+assessment calls spend their time waiting on the network, so those
+workers can run many threads:
+    celery -A config worker -l info -Q celery,whatsapp_incoming -c 8
+    celery -A config worker -l info -Q whatsapp_transcription,whatsapp_ai --pool=threads -c 32
+"""
+
+import os
+import threading
+
+from celery import Celery
+from celery.concurrency.thread import TaskPool as ThreadTaskPool
+from celery.signals import worker_process_init, worker_ready
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+app = Celery('config')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks(['services'])
+
+
+def _start_groq_warm_up():
+    """Pre-warm the Groq connection in the background (see GROQ_WARMUP)."""
+    from django.conf import settings
+    if settings.GROQ_WARMUP and settings.GROQ_API_KEY:
+        from services.groq_service import warm_up
+        threading.Thread(target=warm_up, name='groq-warmup', daemon=True).start()
+
+
+@worker_process_init.connect
+def warm_up_pool_process(**kwargs):
+    """Warm up each prefork child (and the solo pool) once it starts."""
+    _start_groq_warm_up()
+
+
+@worker_ready.connect
+def warm_up_thread_worker(sender, **kwargs):
+    """
+    Threads-pool workers run tasks in the main process, which gets no
+    worker_process_init. Prefork parents are skipped: a client made there
+    would be inherited across the fork by every child.
+    """
+    if issubclass(sender.controller.pool_cls, ThreadTaskPool):
+        _start_groq_warm_up()
@@ -185,6 +185,62 @@ TWILIO_WHATSAPP_NUMBER = os.getenv('TWILIO_WHATSAPP_NUMBER')
 
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 
+# Per-request Groq timeout (seconds) and SDK retries on connection errors, 429s and 5xx
+GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT', 20))
+GROQ_MAX_RETRIES = int(os.getenv('GROQ_MAX_RETRIES', 2))
+
+# Send a 1-token Groq request when each Celery worker process starts, to pre-open the connection
+GROQ_WARMUP = os.getenv('GROQ_WARMUP', 'False').lower() in ('true', '1', 'yes')
+
+# Seconds an exact-match, low-temperature Groq response stays cached in-process
+LIFEGATE_LLM_CACHE_TTL = int(os.getenv('LIFEGATE_LLM_CACHE_TTL', 3600))
+
+# Shared cache for the triage lock, MessageSid dedupe and assessment markers,
+# which only work when every web and worker process sees the same cache.
+# Without REDIS_URL (local development) each process gets its own LocMemCache.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Celery: without a broker, tasks run inline in the calling process
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
+CELERY_TASK_ALWAYS_EAGER = not CELERY_BROKER_URL
+CELERY_TASK_IGNORE_RESULT = True
+# Tasks are acked when they start: the message tasks send WhatsApp replies and
+# write rows, so redelivering one after a worker crash would repeat them.
+# Only the side-effect-free prefetch_assessment opts into acks_late.
+# Assessment generation is the slowest Groq call; keep it off the incoming-message queues
+CELERY_TASK_ROUTES = {
+    'services.tasks.generate_and_send_assessment': {'queue': 'whatsapp_ai'},
+    'services.tasks.prefetch_assessment': {'queue': 'whatsapp_ai'},
+}
+# Reserve one task per worker process, so a slow voice note doesn't hold queued messages behind it
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Application logs go to stderr; raise LIFEGATE_LOG_LEVEL to DEBUG to see webhook payloads
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'lifegate': {
+            'handlers': ['console'],
+            'level': os.getenv('LIFEGATE_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 MAX_TRIAGE_QUESTIONS = 5
 MAX_CONCURRENT_PATIENTS = 15
 CLINICIAN_RESPONSE_SLA_HOURS = 4
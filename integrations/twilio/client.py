@@ -1,11 +1,69 @@
 import logging
 import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client as TwilioRestClient
 from twilio.request_validator import RequestValidator
 
 logger = logging.getLogger('lifegate')
 
+# Process-wide Twilio REST client and media-download session, so their
+# connection pools (and TLS sessions) survive across handler instances.
+_rest_client = None
+_media_session = None
+_lock = threading.Lock()
+
+# Outbound sends run on several threads at once (message_handler._SEND_POOL
+# plus threaded Celery workers); size the keep-alive pool to match.
+_REST_POOL_MAXSIZE = 50
+_REST_TIMEOUT = 10
+
+# (connect, read) seconds for media downloads: fail fast on a dead host,
+# but give a long voice note time to stream
+MEDIA_TIMEOUT = (3, 15)
+
+
+def _get_rest_client(account_sid, auth_token):
+    """Return the shared Twilio REST client, creating it on first use."""
+    global _rest_client
+    if _rest_client is None:
+        with _lock:
+            if _rest_client is None:
+                http_client = TwilioHttpClient(timeout=_REST_TIMEOUT)
+                http_client.session.mount('https://', HTTPAdapter(
+                    pool_connections=10,
+                    pool_maxsize=_REST_POOL_MAXSIZE,
+                ))
+                _rest_client = TwilioRestClient(account_sid, auth_token, http_client=http_client)
+    return _rest_client
+
+
+def get_media_session():
+    """
+    Return the shared requests.Session for downloading Twilio media.
+    
+    The session carries the account's basic auth and retries transient
+    connection errors and 5xx responses.
+    """
+    global _media_session
+    if _media_session is None:
+        with _lock:
+            if _media_session is None:
+                session = requests.Session()
+                session.auth = (settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+                session.mount('https://', HTTPAdapter(
+                    pool_connections=10,
+                    pool_maxsize=20,
+                    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504)),
+                ))
+                _media_session = session
+    return _media_session
+
+
 class TwilioClient:
     """Twilio WhatsApp integration."""
     
@@ -21,7 +79,7 @@ class TwilioClient:
             self.whatsapp_number = raw_number
         
         if self.account_sid and self.auth_token:
-            self.client = TwilioRestClient(self.account_sid, self.auth_token)
+            self.client = _get_rest_client(self.account_sid, self.auth_token)
             self.validator = RequestValidator(self.auth_token)
         else:
             self.client = None
@@ -30,12 +88,12 @@ class TwilioClient:
     def send_message(self, to_whatsapp_id, message_body):
         """Send standard text message."""
         if not self.client:
-            print("Twilio client not configured")
+            logger.warning("Twilio client not configured")
             return None
             
         # 1. FIX: Check for None BEFORE doing anything else
         if not to_whatsapp_id:
-            print("Attempted to send message to None/Empty number")
+            logger.warning("Attempted to send message to None/Empty number")
             return None
 
         # 2. FIX: Standardize the prefix
@@ -53,7 +111,7 @@ class TwilioClient:
             return message.sid
 
         except Exception as e:
-            print(f"Error sending WhatsApp message: {str(e)}")
+            logger.error("Error sending WhatsApp message: %s", e)
             return None
 
     def send_message_with_buttons(self, to_whatsapp_id, message_body, buttons):
@@ -104,7 +162,7 @@ class TwilioClient:
             return message.sid
 
         except Exception as e:
-            print(f"Error sending button message: {str(e)}")
+            logger.error("Error sending button message: %s", e)
             # Fallback to text if buttons fail
             fallback_txt = message_body + "\n\nReply: " + ", ".join([b['title'] for b in buttons])
             return self.send_message(to_whatsapp_id, fallback_txt)
@@ -129,7 +187,7 @@ class TwilioClient:
             logger.info(f"Media message sent: {message.sid}")
             return message.sid
         except Exception as e:
-            print(f"Error sending media message: {str(e)}")
+            logger.error("Error sending media message: %s", e)
             return None
     
     def validate_request(self, request_url, post_params, signature):
@@ -138,8 +196,19 @@ class TwilioClient:
         try:
             return self.validator.validate(request_url, post_params, signature)
         except Exception as e:
-            print(f"Error validating signature: {str(e)}")
+            logger.error("Error validating signature: %s", e)
             return False
 
+    def download_media(self, media_url, timeout=MEDIA_TIMEOUT):
+        """
+        Download a media attachment (e.g. a voice note) from Twilio.
+        
+        Returns:
+            bytes: The media content
+        """
+        response = get_media_session().get(media_url, timeout=timeout)
+        response.raise_for_status()
+        return response.content
+
     def is_configured(self):
         return bool(self.client and self.account_sid and self.auth_token)
\ No newline at end of file
@@ -39,8 +39,8 @@ def custom_exception_handler(exc, context):
     
     else:
         # Log unexpected errors
-        print(
-            f"Unhandled exception: {str(exc)}",
+        logger.error(
+            "Unhandled exception: %s", exc,
             exc_info=True,
             extra={'context': context}
         )
@@ -64,7 +64,7 @@ class ErrorHandlingMiddleware:
             response = self.get_response(request)
             return response
         except Exception as e:
-            print(f"Middleware error: {str(e)}", exc_info=True)
+            logger.error("Middleware error: %s", e, exc_info=True)
             
             # Log service failure
             ServiceFailureLog.objects.create(
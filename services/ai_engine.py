@@ -1,16 +1,85 @@
+import hashlib
 import json
 import logging
+import re
 from datetime import datetime
-from django.conf import settings
+from functools import lru_cache
+from django.core.cache import cache
+from pydantic import ValidationError
 from services.groq_service import GroqService
 from services.fallback_service import FallbackService
+from services.llm_schemas import AssessmentResult
+from services.keywords import MEDICAL, RED_FLAG, classify
 
 logger = logging.getLogger('lifegate')
 
+# Body of a ```json ... ``` (or bare ```) markdown fence
+_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)\s*```', re.DOTALL)
+
+# A usable first question is a single short line ending in a question mark.
+_SANE_QUESTION_RE = re.compile(r'^[^\n]{5,200}\?$')
+
+# Closing answers that add nothing new, so a speculative assessment built
+# without them still holds. Only explicit "nothing more" replies count: a
+# bare yes/no answers the question itself and can change the assessment.
+_NO_CHANGE_RE = re.compile(
+    r"^(none|nothing( else)?|no(thing)? more|no other symptoms?|"
+    r"that'?s (all|it))[.!]*$",
+    re.IGNORECASE,
+)
+
+
+class _UncacheableQuestion(Exception):
+    """Carries a generated question that should not be stored in the cache."""
+    
+    def __init__(self, question):
+        super().__init__(question)
+        self.question = question
+
+
+@lru_cache(maxsize=2048)
+def _first_question_for(age_bucket, gender, complaint_key):
+    """
+    Generate the first triage question for a normalized patient profile.
+    
+    Chief complaints are heavily skewed towards a few common ones, so results
+    are memoized per (age decade, gender, complaint). Answers that fail the
+    sanity check are raised as _UncacheableQuestion so lru_cache skips them.
+    Call `_first_question_for.cache_clear()` to drop cached questions.
+    """
+    age_range = f"{age_bucket * 10}-{age_bucket * 10 + 9}" if age_bucket is not None else "unknown"
+    
+    system_prompt = """You are a medical triage AI assistant. Generate ONE specific, 
+    realistic follow-up question to better understand the patient's symptoms. 
+    Keep the question under 150 characters. Be empathetic and professional."""
+    
+    user_prompt = f"""
+    Patient Age: {age_range}
+    Patient Gender: {gender}
+    Chief Complaint: {complaint_key}
+    
+    Generate ONE clarifying question to understand their symptoms better.
+    """
+    
+    question = GroqService().call_api(
+        system_prompt, user_prompt, max_tokens=GroqService.MAX_TOKENS_QUESTION,
+        label="first_question", model=GroqService.FAST_MODEL,
+    ).strip()
+    if not _SANE_QUESTION_RE.match(question):
+        raise _UncacheableQuestion(question)
+    return question
+
 
 class AIEngine:
     """Main AI engine for triage and assessment generation."""
     
+    ASSESSMENT_CACHE_TIMEOUT = 60 * 60 * 24
+    # Written by prefetch_assessment and read by generate_assessment, which
+    # usually run in different worker processes: only effective with a
+    # shared cache (REDIS_URL), otherwise every lookup misses
+    SPECULATIVE_ASSESSMENT_KEY = "assessment:speculative:{}"
+    NEXT_QUESTION_CACHE_TIMEOUT = 60 * 60 * 24
+    
     def __init__(self):
         self.groq = GroqService()
         self.fallback = FallbackService()
@@ -32,46 +101,33 @@ class AIEngine:
             logger.info("AIEngine: chief_complaint not medical, skipping first question")
             return None
 
-        system_prompt = """You are a medical triage AI assistant. Generate ONE specific, 
-        realistic follow-up question to better understand the patient's symptoms. 
-        Keep the question under 150 characters. Be empathetic and professional."""
-        
-        user_prompt = f"""
-        Patient Age: {age}
-        Patient Gender: {gender}
-        Chief Complaint: {chief_complaint}
-        
-        Generate ONE clarifying question to understand their symptoms better.
-        """
+        age_bucket = age // 10 if isinstance(age, int) else None
+        complaint_key = ' '.join(chief_complaint.lower().split())
         
         try:
-            response = self.groq.call_api(system_prompt, user_prompt, max_tokens=100)
-            return response.strip()
+            return _first_question_for(age_bucket, gender, complaint_key)
+        except _UncacheableQuestion as e:
+            return e.question
         except Exception as e:
-            print(f"Error generating first question: {str(e)}")
+            logger.error("Error generating first question: %s", e)
             return self.fallback.get_first_question(chief_complaint)
     
-    def generate_next_question(self, conversation, current_response):
+    def generate_next_question(self, conversation, current_response, qa_pairs=None):
         """
         Generate next contextual triage question.
         
         Args:
             conversation: ConversationSession object
             current_response: Patient's response to last question
+            qa_pairs: Answered (question, response) tuples, if the caller
+                already has them; otherwise they are loaded here
         
         Returns:
             str: Next triage question
         """
-        # Build conversation history
-        qa_pairs = []
-        questions = conversation.triage_questions.all().order_by('question_order')
-        
-        for q in questions:
-            if q.patient_response:
-                qa_pairs.append({
-                    'question': q.question_text,
-                    'response': q.patient_response
-                })
+        # Build conversation history (only the two columns we need)
+        if qa_pairs is None:
+            qa_pairs = self._answered_pairs(conversation)
         
         # Only continue if conversation seems medical
         if not self._is_medical_text(conversation.chief_complaint) and not self._is_medical_text(current_response):
@@ -82,25 +138,48 @@ class AIEngine:
         context-aware follow-up question based on the patient's responses. 
         Consider what you've learned so far. Keep under 150 characters."""
         
-        user_prompt = f"""
-        Patient Age: {conversation.patient.patient_profile.age}
-        Patient Gender: {conversation.patient.patient_profile.gender}
-        Chief Complaint: {conversation.chief_complaint}
+        profile = conversation.patient.patient_profile
         
-        Previous Q&A:
-        {json.dumps(qa_pairs, indent=2)}
+        # Append-only chat transcript: earlier turns are never reformatted, so
+        # each new turn reuses the previous prompt as a cached prefix.
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": (
+                f"Patient Age: {profile.age}\n"
+                f"Patient Gender: {profile.gender}\n"
+                f"Chief Complaint: {conversation.chief_complaint}"
+            )},
+        ]
+        for question, response in qa_pairs:
+            messages.append({"role": "assistant", "content": question})
+            messages.append({"role": "user", "content": response})
         
-        Last Response: {current_response}
+        if not qa_pairs or qa_pairs[-1][1] != current_response:
+            messages.append({"role": "user", "content": current_response})
         
-        Generate ONE clarifying follow-up question. Be specific and context-aware.
-        """
+        # Common complaints produce the same triage path, worded slightly
+        # differently; reuse the question generated for an equivalent one.
+        cache_key = self._next_question_cache_key(messages[1:])
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         try:
-            response = self.groq.call_api(system_prompt, user_prompt, max_tokens=100)
-            return response.strip()
+            response = self.groq.call_chat(
+                messages,
+                max_tokens=GroqService.MAX_TOKENS_QUESTION,
+                cache_key=f"triage:{conversation.id}",
+                label="next_question",
+                model=GroqService.FAST_MODEL,
+            )
         except Exception as e:
-            print(f"Error generating next question: {str(e)}")
+            logger.error("Error generating next question: %s", e)
             return self.fallback.get_next_question()
+        
+        question = response.strip()
+        if _SANE_QUESTION_RE.match(question):
+            cache.set(cache_key, question, self.NEXT_QUESTION_CACHE_TIMEOUT)
+        return question
     
     def generate_assessment(self, conversation):
         """
@@ -113,12 +192,10 @@ class AIEngine:
             dict: Structured assessment JSON
         """
         # Gather all Q&A
-        qa_data = []
-        for q in conversation.triage_questions.all():
-            qa_data.append({
-                'question': q.question_text,
-                'response': q.patient_response
-            })
+        qa_data = list(
+            conversation.triage_questions.order_by('question_order')
+            .values_list('question_text', 'patient_response')
+        )
         
         profile = conversation.patient.patient_profile
         
@@ -126,11 +203,53 @@ class AIEngine:
         if not self._is_medical_text(conversation.chief_complaint):
             logger.info("AIEngine: conversation chief_complaint not medical, skipping assessment generation")
             return None
-
-        system_prompt = """You are a medical AI assistant generating a clinical assessment.
-        Output ONLY valid JSON with NO markdown, NO explanations, NO code blocks.
-        The JSON must be valid and parseable."""
         
+        # A closing "nothing else"/"that's all" doesn't change the picture, so use the
+        # assessment prefetched while the last question was being answered.
+        if qa_data and _NO_CHANGE_RE.match((qa_data[-1][1] or '').strip()):
+            speculative = cache.get(self.SPECULATIVE_ASSESSMENT_KEY.format(conversation.id))
+            if speculative is not None:
+                logger.info("AIEngine: using speculative assessment for %s", conversation.id)
+                return speculative
+        
+        assessment = self._request_assessment(conversation, profile, qa_data)
+        if not assessment:
+            return self.fallback.get_assessment(
+                chief_complaint=conversation.chief_complaint,
+                profile=profile
+            )
+        return assessment
+    
+    def prefetch_assessment(self, conversation):
+        """
+        Speculatively generate the assessment from the answers so far.
+        
+        Called once the last triage question has been sent; the result is
+        used by generate_assessment if the final answer adds nothing new.
+        
+        Args:
+            conversation: ConversationSession awaiting its final answer
+        """
+        qa_data = self._answered_pairs(conversation)
+        if not qa_data or not self._is_medical_text(conversation.chief_complaint):
+            return
+        
+        profile = conversation.patient.patient_profile
+        assessment = self._request_assessment(conversation, profile, qa_data)
+        if assessment:
+            cache.set(
+                self.SPECULATIVE_ASSESSMENT_KEY.format(conversation.id),
+                assessment,
+                self.ASSESSMENT_CACHE_TIMEOUT,
+            )
+    
+    def _request_assessment(self, conversation, profile, qa_data):
+        """
+        Ask Groq for an assessment over `qa_data`.
+        
+        Returns:
+            dict: Parsed assessment, or None if the call or parsing failed
+        """
         user_prompt = f"""
         Generate a clinical assessment JSON for:
         
@@ -139,124 +258,80 @@ class AIEngine:
         Chief Complaint: {conversation.chief_complaint}
         
         Triage Q&A:
-        {json.dumps(qa_data, indent=2)}
-        
-        Return ONLY this JSON structure:
-        {{
-            "symptoms_overview": {{
-                "primary_symptoms": ["symptom1", "symptom2"],
-                "secondary_symptoms": ["symptom"],
-                "severity_rating": 1-10,
-                "duration": "string",
-                "onset": "sudden/gradual",
-                "triggers": ["trigger1"]
-            }},
-            "key_observations": {{
-                "likely_condition": "string",
-                "risk_factors": ["factor1"],
-                "notes": "string"
-            }},
-            "preliminary_recommendations": {{
-                "lifestyle_changes": ["change1", "change2"],
-                "monitoring": ["item1"],
-                "activities_to_avoid": ["activity1"]
-            }},
-            "otc_suggestions": {{
-                "medications": [
-                    {{
-                        "name": "med_name",
-                        "dosage": "dose_string",
-                        "frequency": "freq_string",
-                        "notes": "string"
-                    }}
-                ]
-            }},
-            "monitoring_advice": {{
-                "what_to_monitor": ["item1"],
-                "frequency": "daily/weekly",
-                "when_to_seek_help": ["condition1"]
-            }},
-            "red_flags_detected": [],
-            "confidence_score": 0.85,
-            "notes_for_clinician": "string"
-        }}
+        {self._format_history(qa_data)}
         """
         
-        try:
-            response = self.groq.call_api(system_prompt, user_prompt, max_tokens=1500)
-            assessment = self._parse_json_response(response)
-            
-            if not assessment:
-                assessment = self.fallback.get_assessment(
-                    chief_complaint=conversation.chief_complaint,
-                    profile=profile
-                )
-            
-            return assessment
+        # Greedy decoding makes the output reproducible, so identical triage
+        # data (e.g. a clinician re-opening a case) can be served from cache.
+        cache_key = self._assessment_cache_key(profile, conversation.chief_complaint, qa_data)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        except Exception as e:
-            print(f"Error generating assessment: {str(e)}")
-            return self.fallback.get_assessment(
-                chief_complaint=conversation.chief_complaint,
-                profile=profile
+        try:
+            response = self.groq.call_api(
+                GroqService.ASSESSMENT_SYSTEM_PROMPT, user_prompt,
+                max_tokens=GroqService.MAX_TOKENS_ASSESSMENT,
+                temperature=0,
+                seed=conversation.id.int & 0xFFFFFFFF,
+                label="assessment",
+                response_format=GroqService.JSON_OBJECT,
             )
-    
-    def detect_red_flags(self, text):
-        """
-        Detect emergency red flags in text.
+        except Exception as e:
+            logger.error("Error generating assessment: %s", e)
+            return None
         
-        Args:
-            text: Patient message text
+        try:
+            assessment = AssessmentResult.model_validate(
+                self._parse_json_response(response)
+            ).model_dump()
+        except ValidationError as e:
+            logger.warning("AIEngine: assessment failed validation: %s", e)
+            return None
         
-        Returns:
-            list: Detected red flags
+        cache.set(cache_key, assessment, self.ASSESSMENT_CACHE_TIMEOUT)
+        return assessment
+    
+    def _assessment_cache_key(self, profile, chief_complaint, qa_data):
+        """Stable cache key for an assessment over the given triage data."""
+        payload = json.dumps([profile.age, profile.gender, chief_complaint, qa_data])
+        return f"assessment:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    def _next_question_cache_key(self, messages):
         """
-        text_lower = text.lower()
-        red_flags = []
+        Cache key for the next question after a triage transcript.
         
-        for keyword in settings.RED_FLAG_KEYWORDS:
-            if keyword in text_lower:
-                red_flags.append(keyword)
-        
-        return red_flags
+        Only case and whitespace are folded, so transcripts differing in
+        word order or negation never share a key.
+        """
+        turns = [f"{m['role']}:{' '.join((m['content'] or '').lower().split())}" for m in messages]
+        payload = json.dumps(turns)
+        return f"triage:next:v2:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    def _answered_pairs(self, conversation):
+        """Return answered triage questions as (question, response) tuples."""
+        return list(
+            conversation.triage_questions.filter(response_processed=True)
+            .order_by('question_order')
+            .values_list('question_text', 'patient_response')
+        )
+
+    def _format_history(self, pairs):
+        """Render (question, response) tuples as a compact Q/A transcript."""
+        return "\n\n".join(f"Q: {q}\nA: {a}" for q, a in pairs)
 
     def _is_medical_text(self, text):
         """Return True if `text` appears medical in nature.
 
         Uses a configurable list in `settings.MEDICAL_KEYWORDS` if available,
-        otherwise falls back to a conservative built-in list. The check is a
-        simple keyword match (case-insensitive)."""
-        try:
-            if not text or not isinstance(text, str):
-                return False
-
-            text_lower = text.lower()
-
-            # Use configured medical keywords when available
-            keywords = getattr(settings, 'MEDICAL_KEYWORDS', None)
-            if not keywords:
-                keywords = [
-                    'pain', 'fever', 'cough', 'headache', 'nausea', 'vomit', 'vomiting',
-                    'bleeding', 'shortness of breath', 'breath', 'dizzy', 'dizziness',
-                    'allergy', 'rash', 'swelling', 'infection', 'temperature', 'antibiotic',
-                    'fracture', 'injury', 'chest pain', 'abdominal', 'diarrhea', 'constipation',
-                    'pregnant', 'pregnancy', 'labor', 'seizure', 'stroke', 'suicide', 'suicidal'
-                ]
-
-            # If any keyword appears, treat as medical
-            for kw in keywords:
-                if kw in text_lower:
-                    return True
-
-            # Also consider presence of numeric vitals patterns (e.g., 'bp', 'bpm', '°c')
-            vitals_tokens = ['bp', 'bpm', 'mmhg', '°c', 'celsius', 'temperature', 'pulse']
-            for t in vitals_tokens:
-                if t in text_lower:
-                    return True
-
-            return False
-        except Exception:
+        otherwise falls back to a conservative built-in list. Red-flag
+        phrases count as medical too. All keywords are compiled into one
+        regex (see services.keywords), so this cheap first-stage check keeps
+        non-medical chatter away from Groq."""
+        if not text or not isinstance(text, str):
             return False
+
+        return bool(classify(text) & {MEDICAL, RED_FLAG})
     
     def _parse_json_response(self, response):
         """
@@ -268,14 +343,16 @@ class AIEngine:
         Returns:
             dict: Parsed JSON or None
         """
+        if not response:
+            logger.error("Empty JSON response")
+            return None
+
         try:
             # Remove markdown code blocks if present
-            if '```json' in response:
-                response = response.split('```json')[1].split('```')[0]
-            elif '```' in response:
-                response = response.split('```')[1].split('```')[0]
+            match = _FENCE_RE.search(response)
+            payload = match.group(1) if match else response.strip()
             
-            return json.loads(response.strip())
-        except (json.JSONDecodeError, IndexError) as e:
-            print(f"Error parsing JSON response: {str(e)}")
+            return json.loads(payload)
+        except json.JSONDecodeError as e:
+            logger.error("Error parsing JSON response: %s", e)
             return None
\ No newline at end of file
@@ -1,5 +1,7 @@
 """Fallback responses when AI service is unavailable."""
 
+import copy
+
 
 class FallbackService:
     """Provide fallback responses for when Groq API fails."""
@@ -23,6 +25,54 @@ class FallbackService:
         "Have you experienced any fever?",
     ]
     
+    # Built once at import; get_assessment() hands out deep copies.
+    ASSESSMENT_TEMPLATE = {
+        "symptoms_overview": {
+            "primary_symptoms": [],
+            "secondary_symptoms": [],
+            "severity_rating": 5,
+            "duration": "unknown",
+            "onset": "gradual",
+            "triggers": []
+        },
+        "key_observations": {
+            "likely_condition": "Assessment pending clinician review",
+            "risk_factors": [],
+            "notes": "Please wait for clinician review for diagnosis"
+        },
+        "preliminary_recommendations": {
+            "lifestyle_changes": [
+                "Get adequate rest",
+                "Stay hydrated",
+                "Monitor your symptoms"
+            ],
+            "monitoring": ["Symptom progression"],
+            "activities_to_avoid": []
+        },
+        "otc_suggestions": {
+            "medications": [
+                {
+                    "name": "Over-the-counter pain relief",
+                    "dosage": "As directed on package",
+                    "frequency": "As needed",
+                    "notes": "Consult clinician before use"
+                }
+            ]
+        },
+        "monitoring_advice": {
+            "what_to_monitor": ["Symptom severity", "Any new symptoms"],
+            "frequency": "daily",
+            "when_to_seek_help": [
+                "If symptoms worsen",
+                "If new symptoms develop",
+                "As recommended by clinician"
+            ]
+        },
+        "red_flags_detected": [],
+        "confidence_score": 0.5,
+        "notes_for_clinician": "Generated from fallback service - Please review thoroughly"
+    }
+    
     def get_first_question(self, chief_complaint):
         """Get first fallback question based on chief complaint."""
         complaint_lower = chief_complaint.lower()
@@ -39,49 +89,6 @@ class FallbackService:
     
     def get_assessment(self, chief_complaint, profile):
         """Get fallback assessment."""
-        return {
-            "symptoms_overview": {
-                "primary_symptoms": [chief_complaint],
-                "secondary_symptoms": [],
-                "severity_rating": 5,
-                "duration": "unknown",
-                "onset": "gradual",
-                "triggers": []
-            },
-            "key_observations": {
-                "likely_condition": "Assessment pending clinician review",
-                "risk_factors": [],
-                "notes": "Please wait for clinician review for diagnosis"
-            },
-            "preliminary_recommendations": {
-                "lifestyle_changes": [
-                    "Get adequate rest",
-                    "Stay hydrated",
-                    "Monitor your symptoms"
-                ],
-                "monitoring": ["Symptom progression"],
-                "activities_to_avoid": []
-            },
-            "otc_suggestions": {
-                "medications": [
-                    {
-                        "name": "Over-the-counter pain relief",
-                        "dosage": "As directed on package",
-                        "frequency": "As needed",
-                        "notes": "Consult clinician before use"
-                    }
-                ]
-            },
-            "monitoring_advice": {
-                "what_to_monitor": ["Symptom severity", "Any new symptoms"],
-                "frequency": "daily",
-                "when_to_seek_help": [
-                    "If symptoms worsen",
-                    "If new symptoms develop",
-                    "As recommended by clinician"
-                ]
-            },
-            "red_flags_detected": [],
-            "confidence_score": 0.5,
-            "notes_for_clinician": "Generated from fallback service - Please review thoroughly"
-        }
\ No newline at end of file
+        assessment = copy.deepcopy(self.ASSESSMENT_TEMPLATE)
+        assessment["symptoms_overview"]["primary_symptoms"] = [chief_complaint]
+        return assessment
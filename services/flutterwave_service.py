@@ -1,7 +1,10 @@
+import logging
 import requests
 import uuid
 from django.conf import settings
 
+logger = logging.getLogger('lifegate')
+
 class FlutterwaveService:
     BASE_URL = "https://api.flutterwave.com/v3"
     
@@ -45,10 +48,16 @@ class FlutterwaveService:
             if response_data.get('status') == 'success':
                 return response_data['data']['link']
             
-            print(f"Flutterwave Init Error: {response_data}")
+            logger.error(
+                "Flutterwave init failed for %s", tx_ref,
+                extra={"tx_ref": tx_ref, "response": response_data},
+            )
             return None
-        except Exception as e:
-            print(f"Flutterwave Connection Error: {e}")
+        except (requests.RequestException, ValueError) as e:
+            logger.error(
+                "Flutterwave connection error for %s: %s", tx_ref, e,
+                extra={"tx_ref": tx_ref},
+            )
             return None
 
     def verify_transaction(self, transaction_id):
@@ -64,5 +73,9 @@ class FlutterwaveService:
                 data['data']['currency'] == 'NGN'):
                 return True, data['data']
             return False, None
-        except:
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.error(
+                "Flutterwave verification failed for %s: %s", transaction_id, e,
+                extra={"transaction_id": transaction_id},
+            )
             return False, None
\ No newline at end of file
@@ -1,24 +1,307 @@
-import requests
-import tempfile
-import os
+import hashlib
+import httpx
+import json
 import logging
+import string
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from functools import wraps
 from django.conf import settings
-from groq import Groq
+from groq import (
+    APIConnectionError, DefaultHttpxClient, Groq, GroqError, InternalServerError, RateLimitError,
+)
+from integrations.twilio.client import MEDIA_TIMEOUT, get_media_session
 
 logger = logging.getLogger('lifegate')
 
 
+def timed_groq(label):
+    """
+    Decorate a Groq completion call to log its latency and token usage.
+    
+    Groq reports server-side prefill (prompt_time) and decode
+    (completion_time) durations on `usage`; logging them next to the
+    wall-clock time shows whether a call is queue-, prefill- or decode-bound.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            completion = func(*args, **kwargs)
+            total_ms = (time.perf_counter() - started) * 1000
+            usage = getattr(completion, 'usage', None)
+            details = getattr(usage, 'prompt_tokens_details', None)
+            metrics = {
+                'groq_call': label,
+                'total_ms': round(total_ms, 1),
+                'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+                'completion_tokens': getattr(usage, 'completion_tokens', None),
+                'cached_tokens': getattr(details, 'cached_tokens', None),
+                'queue_time': getattr(usage, 'queue_time', None),
+                'prompt_time': getattr(usage, 'prompt_time', None),
+                'completion_time': getattr(usage, 'completion_time', None),
+            }
+            logger.info(
+                "Groq %s: %.0fms, %s prompt / %s completion tokens",
+                label, total_ms, metrics['prompt_tokens'], metrics['completion_tokens'],
+                extra=metrics,
+            )
+            return completion
+        return wrapper
+    return decorator
+
+
+class GroqCircuitOpen(GroqError):
+    """Raised instead of calling Groq while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fail fast after repeated transient Groq failures.
+    
+    After `fail_max` consecutive failures the breaker opens and calls raise
+    GroqCircuitOpen immediately. After `reset_timeout` seconds one trial
+    call is let through; success closes the breaker, failure re-opens it.
+    """
+    
+    # Failures that say Groq is unreachable or overloaded, not that the
+    # request itself was bad
+    TRANSIENT_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+    
+    def __init__(self, fail_max=5, reset_timeout=30):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+    
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise GroqCircuitOpen("Groq circuit breaker is open")
+            # Half-open: let this call through as a trial
+            self._opened_at = time.monotonic()
+    
+    def record(self, error=None):
+        with self._lock:
+            if error is None:
+                self._failures = 0
+                self._opened_at = None
+            elif isinstance(error, self.TRANSIENT_ERRORS):
+                self._failures += 1
+                if self._failures >= self.fail_max:
+                    if self._opened_at is None:
+                        logger.error("Groq circuit breaker opened after %s failures", self._failures)
+                    self._opened_at = time.monotonic()
+    
+    def call(self, func, *args, **kwargs):
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record(e)
+            raise
+        self.record()
+        return result
+
+
+_breaker = CircuitBreaker()
+
+
+def _client_options():
+    """
+    Timeout and retry settings for the Groq client.
+    
+    The SDK already retries connection errors, 429s and 5xx with
+    exponential backoff; we only bound it, since its default timeout is
+    ten minutes.
+    """
+    return {
+        'api_key': settings.GROQ_API_KEY,
+        'timeout': settings.GROQ_TIMEOUT,
+        'max_retries': settings.GROQ_MAX_RETRIES,
+    }
+
+
+# One sync client per process, so its HTTP connection pool (and the TLS
+# sessions in it) is reused across every GroqService instance. HTTP/2 lets
+# concurrent calls share one connection instead of opening one each.
+_HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60)
+_client = None
+_client_lock = threading.Lock()
+
+
+def _get_client():
+    """Return the process-wide Groq client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Groq(
+                    http_client=DefaultHttpxClient(http2=True, limits=_HTTP_LIMITS),
+                    **_client_options(),
+                )
+    return _client
+
+
+def warm_up():
+    """
+    Open the shared client's connection and send a 1-token completion.
+    
+    Called once per worker process at startup (see config/celery.py) so the first
+    patient message doesn't pay for DNS, the TLS handshake and Groq's
+    cold path. Failures are logged and otherwise ignored.
+    """
+    try:
+        started = time.perf_counter()
+        _get_client().chat.completions.create(
+            model=GroqService.FAST_MODEL,
+            messages=[{"role": "user", "content": "ping"}],
+            max_tokens=1,
+        )
+        logger.info("Groq warm-up done in %.0fms", (time.perf_counter() - started) * 1000)
+    except Exception as e:
+        logger.warning("Groq warm-up failed: %s", e)
+
+
+# In-process LRU of exact (model, messages, max_tokens, temperature, seed,
+# response_format) matches for low-temperature calls: key -> (expires_at, response)
+_EXACT_CACHE_SIZE = 1024
+_exact_cache = OrderedDict()
+_exact_cache_lock = threading.Lock()
+
+
+def _exact_cache_key(model, messages, max_tokens, temperature, seed, response_format=None):
+    """Hash the full request so identical calls map to the same entry."""
+    raw = json.dumps([model, messages, max_tokens, temperature, seed, response_format], sort_keys=True)
+    return hashlib.blake2b(raw.encode(), digest_size=16).digest()
+
+
+def _exact_cache_get(key):
+    with _exact_cache_lock:
+        entry = _exact_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del _exact_cache[key]
+            return None
+        _exact_cache.move_to_end(key)
+        return response
+
+
+def _exact_cache_set(key, response):
+    ttl = getattr(settings, 'LIFEGATE_LLM_CACHE_TTL', 3600)
+    with _exact_cache_lock:
+        _exact_cache[key] = (time.monotonic() + ttl, response)
+        _exact_cache.move_to_end(key)
+        while len(_exact_cache) > _EXACT_CACHE_SIZE:
+            _exact_cache.popitem(last=False)
+
+
+# Identical requests currently waiting on Groq: request key -> Future.
+# Later callers wait on the first caller's result instead of re-sending it.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
 class GroqService:
     """Groq API integration for medical AI."""
     
-    MODEL = "llama-3.3-70b-versatile"
+    # 70B for reasoning-heavy assessments; 8B for short questions and
+    # classification, where its ~3x decode speed matters more than depth.
+    PRIMARY_MODEL = "llama-3.3-70b-versatile"
+    FAST_MODEL = "llama-3.1-8b-instant"
+    # Voice notes are short English clips; turbo transcribes them several
+    # times faster than whisper-large-v3 at near-identical accuracy.
+    TRANSCRIPTION_MODEL = "whisper-large-v3-turbo"
     DEFAULT_TEMPERATURE = 0.7
     DEFAULT_MAX_TOKENS = 500
     
+    # Output caps; Groq reserves capacity against max_tokens up front. The
+    # assessment keeps its original 1500 until timed_groq's completion_tokens
+    # logs show real usage: a truncated reply is invalid JSON and falls back.
+    MAX_TOKENS_QUESTION = 100
+    MAX_TOKENS_ASSESSMENT = 1500
+    STOP_SEQUENCES = ["\n\n\n"]
+    
+    # Calls at or below this temperature are cached on their exact inputs
+    # and coalesced with identical requests already in flight
+    EXACT_CACHE_MAX_TEMPERATURE = 0.1
+    
+    # Groq JSON mode: the sampler is constrained to emit a valid JSON object
+    JSON_OBJECT = {"type": "json_object"}
+    
+    # Role and JSON schema are static, so they form a reusable cached prefix;
+    # only patient data goes in the user message.
+    ASSESSMENT_SYSTEM_PROMPT = """You are a medical AI assistant generating a clinical assessment.
+    Return a JSON object with this structure:
+    {
+        "symptoms_overview": {
+            "primary_symptoms": ["symptom1", "symptom2"],
+            "secondary_symptoms": ["symptom"],
+            "severity_rating": 1-10,
+            "duration": "string",
+            "onset": "sudden/gradual",
+            "triggers": ["trigger1"]
+        },
+        "key_observations": {
+            "likely_condition": "string",
+            "risk_factors": ["factor1"],
+            "notes": "string"
+        },
+        "preliminary_recommendations": {
+            "lifestyle_changes": ["change1", "change2"],
+            "monitoring": ["item1"],
+            "activities_to_avoid": ["activity1"]
+        },
+        "otc_suggestions": {
+            "medications": [
+                {
+                    "name": "med_name",
+                    "dosage": "dose_string",
+                    "frequency": "freq_string",
+                    "notes": "string"
+                }
+            ]
+        },
+        "monitoring_advice": {
+            "what_to_monitor": ["item1"],
+            "frequency": "daily/weekly",
+            "when_to_seek_help": ["condition1"]
+        },
+        "red_flags_detected": [],
+        "confidence_score": 0.85,
+        "notes_for_clinician": "string"
+    }"""
+    
+    TRIAGE_SYSTEM_PROMPT = """You are an expert medical triage AI assistant. 
+    Your role is to ask ONE specific, clinically relevant follow-up question 
+    to better understand the patient's condition. 
+    Keep questions under 150 characters. Be empathetic."""
+    
+    # User-prompt templates are parsed once; calls only fill the slots
+    TRIAGE_USER_TEMPLATE = string.Template("""
+    Patient Profile:
+    - Age: ${age}
+    - Gender: ${gender}
+    - Chief Complaint: ${chief_complaint}
+    
+    Recent Conversation:
+    ${history}
+    
+    Generate ONE specific follow-up question. Make it clinically relevant and context-aware.
+    """)
+    
     def __init__(self):
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
+        self.client = _get_client()
     
-    def call_api(self, system_prompt, user_prompt, max_tokens=None, temperature=None):
+    def call_api(self, system_prompt, user_prompt, max_tokens=None, temperature=None, seed=None,
+                 label="chat", model=None, response_format=None):
         """
         Call Groq API with medical context.
         
@@ -27,30 +310,128 @@ class GroqService:
             user_prompt: User message
             max_tokens: Maximum tokens (default: 500)
             temperature: Creativity parameter (default: 0.7)
+            seed: Sampling seed for reproducible output
+            label: Call-site name used in latency/usage logs
+            model: Groq model id (default: PRIMARY_MODEL)
+            response_format: e.g. JSON_OBJECT to force a JSON reply
+        
+        Returns:
+            str: AI response
+        """
+        return self.call_chat(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            seed=seed,
+            label=label,
+            model=model,
+            response_format=response_format,
+        )
+    
+    def call_chat(self, messages, max_tokens=None, temperature=None, cache_key=None, seed=None,
+                  label="chat", model=None, response_format=None):
+        """
+        Call Groq API with a full chat message list.
+        
+        Args:
+            messages: List of {"role", "content"} dicts, oldest first
+            max_tokens: Maximum tokens (default: 500)
+            temperature: Creativity parameter (default: 0.7)
+            cache_key: Stable prompt_cache_key so repeated prefixes hit
+                the provider's prefix cache
+            seed: Sampling seed for reproducible output
+            label: Call-site name used in latency/usage logs
+            model: Groq model id (default: PRIMARY_MODEL)
+            response_format: e.g. JSON_OBJECT to force a JSON reply
         
         Returns:
             str: AI response
         """
+        model = model or self.PRIMARY_MODEL
         max_tokens = max_tokens or self.DEFAULT_MAX_TOKENS
-        temperature = temperature or self.DEFAULT_TEMPERATURE
+        if temperature is None:
+            temperature = self.DEFAULT_TEMPERATURE
+        extra_body = {"prompt_cache_key": cache_key} if cache_key else None
         
+        # Sampled calls differ run to run, so only near-deterministic ones
+        # are cached or shared with an identical request
+        if temperature > self.EXACT_CACHE_MAX_TEMPERATURE:
+            return self._create_chat(
+                messages, model, max_tokens, temperature, seed, response_format,
+                extra_body, label,
+            )
+        
+        request_key = _exact_cache_key(
+            model, messages, max_tokens, temperature, seed, response_format
+        )
+        cached = _exact_cache_get(request_key)
+        if cached is not None:
+            return cached
+        
+        # Coalesce with an identical request that is already in flight
+        with _inflight_lock:
+            inflight = _inflight.get(request_key)
+            if inflight is None:
+                leader = _inflight[request_key] = Future()
+        if inflight is not None:
+            # The leader gets at most one client timeout per SDK attempt; if it
+            # is still not done after that, it is stuck, so call Groq directly
+            wait = settings.GROQ_TIMEOUT * (settings.GROQ_MAX_RETRIES + 1)
+            try:
+                return inflight.result(timeout=wait)
+            except FutureTimeoutError:
+                logger.warning("Groq %s: coalesced request timed out after %ss, calling directly", label, wait)
+                return self._create_chat(
+                    messages, model, max_tokens, temperature, seed, response_format,
+                    extra_body, label,
+                )
+        
+        try:
+            response = self._create_chat(
+                messages, model, max_tokens, temperature, seed, response_format,
+                extra_body, label,
+            )
+            _exact_cache_set(request_key, response)
+            leader.set_result(response)
+            return response
+        except Exception as e:
+            leader.set_exception(e)
+            raise
+        finally:
+            with _inflight_lock:
+                _inflight.pop(request_key, None)
+    
+    def _create_chat(self, messages, model, max_tokens, temperature, seed, response_format,
+                     extra_body, label):
+        """Send one chat completion to Groq and return its text."""
         try:
-            message = self.client.chat.completions.create(
-                model=self.MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+            message = _breaker.call(
+                timed_groq(label)(self.client.chat.completions.create),
+                model=model,
+                messages=messages,
                 max_tokens=max_tokens,
                 temperature=temperature,
+                seed=seed,
+                stop=self.STOP_SEQUENCES,
+                response_format=response_format,
+                extra_body=extra_body,
             )
             
             response = message.choices[0].message.content
-            logger.debug(f"Groq API response: {response[:100]}...")
+            logger.debug("Groq API response: %.100s...", response, extra={'model': model})
             return response
         
         except Exception as e:
-            print(f"Groq API error: {str(e)}")
+            logger.error(
+                "Groq API error: %s", e,
+                extra={
+                    'model': model,
+                    'prompt_len': sum(len(m.get('content') or '') for m in messages),
+                },
+            )
             raise
     
     def generate_triage_question(self, context):
@@ -63,131 +444,25 @@ class GroqService:
         Returns:
             str: Generated question
         """
-        system_prompt = """You are an expert medical triage AI assistant. 
-        Your role is to ask ONE specific, clinically relevant follow-up question 
-        to better understand the patient's condition. 
-        Keep questions under 150 characters. Be empathetic."""
-        
-        history_text = ""
-        if context.get('conversation_history'):
-            for item in context['conversation_history'][-3:]:  # Last 3 exchanges
-                history_text += f"Q: {item.get('question', '')}\nA: {item.get('response', '')}\n"
-        
-        user_prompt = f"""
-        Patient Profile:
-        - Age: {context.get('age')}
-        - Gender: {context.get('gender')}
-        - Chief Complaint: {context.get('chief_complaint')}
-        
-        Recent Conversation:
-        {history_text}
-        
-        Generate ONE specific follow-up question. Make it clinically relevant and context-aware.
-        """
-        
-        return self.call_api(system_prompt, user_prompt, max_tokens=100)
+        system_prompt, user_prompt = self._triage_prompts(context)
+        return self.call_api(system_prompt, user_prompt, max_tokens=self.MAX_TOKENS_QUESTION,
+                             label="triage_question", model=self.FAST_MODEL)
     
-    def generate_assessment_json(self, triage_data, profile_data):
-        """
-        Generate structured clinical assessment.
-        
-        Args:
-            triage_data: List of Q&A pairs
-            profile_data: Patient profile info
-        
-        Returns:
-            str: JSON assessment
-        """
-        import json
-        
-        system_prompt = """You are a medical AI generating clinical assessments.
-        Output ONLY valid JSON with NO markdown, NO explanations.
-        Ensure the JSON is perfectly formatted and parseable."""
-        
-        triage_json = json.dumps(triage_data, indent=2)
-        
-        user_prompt = f"""
-        Generate a clinical assessment for:
-        
-        Age: {profile_data.get('age')}
-        Gender: {profile_data.get('gender')}
-        Chief Complaint: {profile_data.get('chief_complaint')}
-        
-        Triage Q&A:
-        {triage_json}
+    def _triage_prompts(self, context):
+        """Build the (system, user) prompt pair for a triage question."""
+        history_text = ""
+        for item in (context.get('conversation_history') or [])[-3:]:  # Last 3 exchanges
+            history_text += f"Q: {item.get('question', '')}\nA: {item.get('response', '')}\n"
         
-        Return ONLY valid JSON matching this structure:
-        {{
-            "symptoms_overview": {{
-                "primary_symptoms": ["symptom1", "symptom2"],
-                "secondary_symptoms": ["symptom"],
-                "severity_rating": 5,
-                "duration": "3 days",
-                "onset": "gradual",
-                "triggers": ["trigger1"]
-            }},
-            "key_observations": {{
-                "likely_condition": "condition name",
-                "risk_factors": ["factor1"],
-                "notes": "clinical notes"
-            }},
-            "preliminary_recommendations": {{
-                "lifestyle_changes": ["rest", "hydration"],
-                "monitoring": ["symptom severity"],
-                "activities_to_avoid": ["strenuous activity"]
-            }},
-            "otc_suggestions": {{
-                "medications": [
-                    {{
-                        "name": "Ibuprofen",
-                        "dosage": "200-400mg",
-                        "frequency": "Every 6-8 hours",
-                        "notes": "Take with food"
-                    }}
-                ]
-            }},
-            "monitoring_advice": {{
-                "what_to_monitor": ["symptom1"],
-                "frequency": "daily",
-                "when_to_seek_help": ["if symptom worsens"]
-            }},
-            "red_flags_detected": [],
-            "confidence_score": 0.85,
-            "notes_for_clinician": "additional notes"
-        }}
-        """
+        user_prompt = self.TRIAGE_USER_TEMPLATE.safe_substitute(
+            age=context.get('age'),
+            gender=context.get('gender'),
+            chief_complaint=context.get('chief_complaint'),
+            history=history_text,
+        )
         
-        return self.call_api(system_prompt, user_prompt, max_tokens=1500)
+        return self.TRIAGE_SYSTEM_PROMPT, user_prompt
     
-    def detect_red_flags_ai(self, text):
-        """
-        Use AI to detect medical emergency red flags.
-        
-        Args:
-            text: Patient message
-        
-        Returns:
-            list: Detected red flags with severity
-        """
-        system_prompt = """You are a medical emergency detection AI.
-        Analyze the text for medical red flags indicating emergencies.
-        Return ONLY a JSON array of detected flags."""
-        
-        user_prompt = f"""
-        Analyze for red flags:
-        "{text}"
-        
-        Return ONLY a JSON array like: ["flag1", "flag2"]
-        """
-        
-        try:
-            response = self.call_api(system_prompt, user_prompt, max_tokens=200)
-            import json
-            return json.loads(response)
-        except:
-            return []
-        
-        
     def transcribe_audio_from_url(self, media_url):
         """
         Download audio from Twilio Media URL and transcribe using Groq Whisper.
@@ -198,45 +473,19 @@ class GroqService:
         Returns:
             str: Transcribed text
         """
-        audio_path = None
         try:
-            # Twilio media requires basic auth
-            auth = (
-                settings.TWILIO_ACCOUNT_SID,
-                settings.TWILIO_AUTH_TOKEN
-            )
+            # Twilio media requires basic auth, which the shared session carries
             logger.info("Downloading voice note from Twilio")
 
-            response = requests.get(media_url, auth=auth, timeout=15)
+            response = get_media_session().get(media_url, timeout=MEDIA_TIMEOUT)
             response.raise_for_status()
 
-            # Save audio temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".ogg") as tmp:
-                tmp.write(response.content)
-                audio_path = tmp.name
-
-            logger.info("Sending audio to Groq Whisper for transcription")
-
-            with open(audio_path, "rb") as audio_file:
-                transcription = self.client.audio.transcriptions.create(
-                    file=audio_file,
-                    model="whisper-large-v3",
-                    language="en"
-                )
-            return transcription.text
+            return self.transcribe_audio_from_bytes(response.content)
 
         except Exception as e:
-            logger.error(f"Groq Whisper transcription failed: {e}")
+            logger.error("Groq Whisper transcription failed: %s", e)
             raise
 
-        finally:
-            # Cleanup temp file
-            try:
-                if audio_path and os.path.exists(audio_path):
-                    os.remove(audio_path)
-            except Exception:
-                pass
-
     def transcribe_audio(self, media_url):
         """
         Use Groq Whisper to transcribe audio from a URL by downloading it and transcribing.
@@ -245,21 +494,27 @@ class GroqService:
         try:
             return self.transcribe_audio_from_url(media_url)
         except Exception as e:
-            logger.error(f"Groq transcription error: {e}")
+            logger.error("Groq transcription error: %s", e)
             return None
 
-    def transcribe_audio_from_bytes(self, audio_bytes):
+    def transcribe_audio_from_bytes(self, audio_bytes, filename="voice.ogg"):
         """
         Transcribe audio provided as bytes using Groq Whisper.
+        
+        Args:
+            audio_bytes (bytes): Audio content, already downloaded
+            filename (str): Name sent with the upload; its extension tells
+                Whisper the format (WhatsApp voice notes are .ogg)
+        
+        Returns:
+            str: Transcribed text
         """
-        import io
-
-        audio_file = io.BytesIO(audio_bytes)
-        audio_file.name = "voice.ogg"  # WhatsApp voice format
+        logger.info("Sending audio to Groq Whisper for transcription")
 
         response = self.client.audio.transcriptions.create(
-            file=audio_file,
-            model="whisper-large-v3"
+            file=(filename, audio_bytes),
+            model=self.TRANSCRIPTION_MODEL,
+            language="en"
         )
 
         return response.text
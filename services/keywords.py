@@ -0,0 +1,68 @@
+"""Keyword matching for patient messages, done without calling Groq."""
+
+import re
+from functools import lru_cache
+from django.conf import settings
+
+RED_FLAG = 'red_flag'
+MEDICAL = 'medical'
+
+# Colloquial emergency phrasings on top of settings.RED_FLAG_KEYWORDS
+_EMERGENCY_PHRASES = (
+    "can't breathe", "cant breathe", "cannot breathe", "not breathing",
+    "crushing chest pain", "stroke symptoms", "coughing blood", "vomiting blood",
+    "passed out", "not waking up",
+)
+
+_DEFAULT_MEDICAL_KEYWORDS = (
+    'pain', 'fever', 'cough', 'headache', 'nausea', 'vomit', 'vomiting',
+    'bleeding', 'shortness of breath', 'breath', 'dizzy', 'dizziness',
+    'allergy', 'rash', 'swelling', 'infection', 'temperature', 'antibiotic',
+    'fracture', 'injury', 'chest pain', 'abdominal', 'diarrhea', 'constipation',
+    'pregnant', 'pregnancy', 'labor', 'seizure', 'stroke', 'suicide', 'suicidal'
+)
+
+# Numeric vitals patterns (e.g. 'bp', 'bpm', '°c') also count as medical
+_VITALS_TOKENS = ('bp', 'bpm', 'mmhg', '°c', 'celsius', 'temperature', 'pulse')
+
+
+def _alternation(terms):
+    """Longest-first alternation, so multi-word phrases win over their parts."""
+    return '|'.join(map(re.escape, sorted(set(terms), key=len, reverse=True)))
+
+
+@lru_cache(maxsize=4)
+def _classifier_pattern(red_flags, medical):
+    """
+    Compile every keyword bucket into one regex with a named group each.
+    
+    Red flags come first, so a phrase in both lists (e.g. 'chest pain')
+    is reported as a red flag.
+    """
+    return re.compile(
+        f"(?P<{RED_FLAG}>{_alternation(red_flags + _EMERGENCY_PHRASES)})"
+        f"|(?P<{MEDICAL}>{_alternation(medical + _VITALS_TOKENS)})"
+    )
+
+
+def _red_flag_keywords():
+    return tuple(k.lower() for k in settings.RED_FLAG_KEYWORDS)
+
+
+def _medical_keywords():
+    keywords = getattr(settings, 'MEDICAL_KEYWORDS', None) or _DEFAULT_MEDICAL_KEYWORDS
+    return tuple(k.lower() for k in keywords)
+
+
+def classify(text):
+    """
+    Scan `text` once and report which keyword buckets it hits.
+    
+    Args:
+        text: Patient message
+    
+    Returns:
+        set: Subset of {RED_FLAG, MEDICAL}
+    """
+    pattern = _classifier_pattern(_red_flag_keywords(), _medical_keywords())
+    return {match.lastgroup for match in pattern.finditer(text.lower())}
@@ -0,0 +1,23 @@
+"""Pydantic models for validating structured Groq responses."""
+
+from pydantic import BaseModel, ConfigDict
+
+
+class AssessmentResult(BaseModel):
+    """
+    Top-level shape of a clinical assessment.
+
+    Only the sections are checked; their contents vary too much between
+    conditions to pin down, and extra keys are kept as-is.
+    """
+
+    model_config = ConfigDict(extra='allow')
+
+    symptoms_overview: dict
+    key_observations: dict
+    preliminary_recommendations: dict
+    otc_suggestions: dict
+    monitoring_advice: dict
+    red_flags_detected: list = []
+    confidence_score: float | None = None
+    notes_for_clinician: str = ""
@@ -1,9 +1,10 @@
-from pydoc import text
-import requests
 import logging
-import json
 import string
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.utils import timezone 
 from django.conf import settings
 from apps.authentication.models import User, PatientProfile, ClinicianProfile
@@ -12,17 +13,31 @@ from apps.assessments.models import AIAssessment
 from apps.escalations.models import EscalationAlert, EscalationRule
 from apps.audit.models import AuditLog
 from integrations.twilio.client import TwilioClient
+from apps.clinician.models import ClinicianAvailability, PatientAssignment
+from apps.clinician.whatsapp_handler import get_clinician_handler
 from services.groq_service import GroqService
+from pydantic import ValidationError
+from services.keywords import RED_FLAG, classify
+from services.llm_schemas import AssessmentResult
 from services.ai_engine import AIEngine
-from requests.auth import HTTPBasicAuth
 from services.flutterwave_service import FlutterwaveService
 import uuid
 from apps.subscriptions.models import PatientSubscription, CreditPackage, PaymentHistory
 from services.workflow_service import finalize_consultation_flow
+from services.tasks import generate_and_send_assessment, prefetch_assessment
 
 
 logger = logging.getLogger('lifegate')
 
+# Deletes punctuation in str.translate (see _normalize_transcription)
+_PUNCT_TABLE = str.maketrans('', '', string.punctuation)
+
+# Threads for outbound Twilio sends that overlap with unbuffered DB writes (see _reply)
+_SEND_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='twilio-send')
+
+# Rows buffered per thread during process_incoming_message (see _defer_create)
+_pending_writes = threading.local()
+
 
 class MessageHandler:
     """Main handler for incoming WhatsApp messages."""
@@ -64,35 +79,118 @@ To continue, reply:
         'chief_complaint': "Perfect! Now, what brings you here today? Please describe what's bothering you.",
     }
     
+    # Profile fields collected in order: (field, parser method, next question, retry prompt)
+    PROFILE_STEPS = (
+        ('age', '_parse_age', 'gender', "Please enter a valid age (number)"),
+        ('gender', '_parse_gender', 'chief_complaint', "Please reply: Male, Female, or Other"),
+    )
+    
+    # Genders a patient can type during onboarding (upper-cased)
+    VALID_GENDERS = frozenset({'MALE', 'FEMALE', 'OTHER'})
+    
+    # Greetings that are not a chief complaint (lower-cased)
+    GREETINGS = frozenset({'hi', 'hello', 'hey'})
+    
+    # (status, upper-cased message) -> handler, checked before STATUS_ROUTES
+    COMMAND_ROUTES = {
+        ('AWAITING_ACCEPTANCE', 'GET STARTED'): '_accept_terms',
+        ('AWAITING_ACCEPTANCE', 'DECLINE'): '_decline_terms',
+    }
+    
+    # Conversation status -> handler method for an incoming patient message
+    STATUS_ROUTES = {
+        'INITIAL': '_send_welcome_screen',
+        'AWAITING_PATIENT_PROFILE': '_handle_profile_collection',
+        'AI_TRIAGE_IN_PROGRESS': '_handle_triage_response',
+        'PENDING_CLINICIAN_REVIEW': '_handle_pending_review',
+        'DIRECT_MESSAGING': '_handle_direct_message',
+    }
+    
+    # Narrative assessment summary sent to the patient (see _format_patient_summary)
+    PATIENT_SUMMARY_TEMPLATE = (
+        "📋 *YOUR HEALTH SUMMARY*\n"
+        "_(To be reviewed by Doctor)_\n\n"
+        "Hey, looks like you've got a {condition} going on 😷. "
+        "Symptoms include {symptoms_text}{context_note} 🤔. "
+        "Severity is {severity_text} ({severity_score}/10). "
+        "The doctor is reviewing your case and will get back to you with a prescription or advice 💊. \n"
+        "Anything else to add? Just reply to this message, and the doctor will see it."
+    )
+    
+    # Patient-facing wording for severity ratings 0-10
+    SEVERITY_LABELS = ('mild',) * 4 + ('moderate',) * 4 + ('high',) * 3
+    
+    # Twilio media content type -> file extension for Whisper uploads
+    AUDIO_EXTENSIONS = {
+        'audio/ogg': 'ogg',
+        'audio/mpeg': 'mp3',
+        'audio/mp4': 'm4a',
+        'audio/wav': 'wav',
+        'audio/webm': 'webm',
+    }
+    
+    # Per-conversation lock around a triage turn (needs a cache shared by all
+    # workers, see CACHES / REDIS_URL in settings)
+    TRIAGE_LOCK_KEY = "triage:lock:{}"
+    TRIAGE_LOCK_TIMEOUT = 30
+    TRIAGE_BUSY_MESSAGE = (
+        "⏳ Still working on your previous answer. "
+        "Please send this again after my next question."
+    )
+    
+    # After this many empty AI questions in a row, a conversation finishes
+    # triage on FallbackService questions without calling the AI
+    EMPTY_QUESTION_KEY = "triage:empty:{}"
+    EMPTY_QUESTION_LIMIT = 2
+    EMPTY_QUESTION_TIMEOUT = 60 * 60
+    
+    # Marks an assessment as queued, so messages sent while it is generating
+    # don't queue another; expires so a failed run can be retried
+    ASSESSMENT_QUEUED_KEY = "triage:assessing:{}"
+    ASSESSMENT_QUEUED_TIMEOUT = 5 * 60
+    
+    EMPTY_QUESTION_FALLBACK = "Can you tell me more about your symptoms? Any other details that might help?"
+    NEXT_QUESTION_FALLBACK = "Thank you. Can you describe any other symptoms you're experiencing?"
+    
+    ASSESSMENT_PENDING_MESSAGE = "Thanks! 🩺 Reviewing your answers now, this takes a few seconds..."
+    
+    ASSESSMENT_LOCKED_MESSAGE = (
+        "✅ *ASSESSMENT COMPLETE*\n\n"
+        "We have analyzed your symptoms.\n"
+        "To unlock your full results and have a doctor review your case, please use a credit.\n\n"
+        "🔒 *Balance: 0 Credits*\n"
+        "👇 *Select a package to unlock:*"
+    )
+    
     def __init__(self):
         self.twilio = TwilioClient()
         self.groq = GroqService()
         self.ai_engine = AIEngine()
+        self.flutterwave = FlutterwaveService()
     
-    def process_incoming_message(self, incoming_data):
+    def process_incoming_message(self, incoming_data, user=None):
         """
         Main webhook handler for incoming WhatsApp messages.
         
         Args:
             incoming_data: dict with from, body, etc from Twilio
+            user: The sender, if the caller already loaded it (with
+                patient_profile); otherwise looked up or registered here
         """
-        #debug
-        print("Incoming webhook received!")
-        print(incoming_data)
+        logger.debug("Incoming webhook: %s", incoming_data)
         
         self.incoming_data = incoming_data
+        _pending_writes.objects = []
         
         try:
             whatsapp_id = incoming_data.get('From')
             # Check if message contains media (voice note)
-            message_body = self._normalize_transcription(incoming_data['Body'])
-           # message_body = incoming_data.get('Body', '').strip()
             media_url = incoming_data.get('MediaUrl0')
             media_type = incoming_data.get('MediaContentType0')
 
             if media_url:
-                print("🎤 Voice message detected")
-                transcription = self._transcribe_audio(media_url)
+                logger.debug("Voice message from %s", whatsapp_id)
+                transcription = self._transcribe_audio(media_url, media_type)
 
                 if transcription:
                    message_body = self._normalize_transcription(transcription)
@@ -103,16 +201,19 @@ To continue, reply:
             else:
                 message_body = incoming_data.get('Body', '').strip() or "[Empty message]"
 
-            logger.info(f"Processing message from {whatsapp_id}: {message_body[:50]}")
+            logger.info("Processing message from %s: %s", whatsapp_id, message_body[:50])
             
             # Step 1: Get or create user
-            user, created = self._get_or_create_user(whatsapp_id)
+            if user is not None:
+                created = False
+            else:
+                user, created = self._get_or_create_user(whatsapp_id)
             if not user:
-                print(f"Failed to create user for {whatsapp_id}")
+                logger.error("Failed to create user for %s", whatsapp_id)
                 return False
             
             if created:
-                logger.info(f"Auto-registered new patient: {user.phone_number}")
+                logger.info("Auto-registered new patient: %s", user.phone_number)
                 
             conversation = self._get_or_create_conversation(user)
             
@@ -120,9 +221,11 @@ To continue, reply:
             if self._handle_package_selection(user, message_body):
                 return True
             
-            # Step 3: Save incoming message
+            # Step 3 & 4: Record incoming message and log it. Both are
+            # written with the replies in one transaction by _flush_writes;
+            # the UUID primary key is set here, so the log can reference it.
             # ✅ Ensure Message model has media_url and media_type fields
-            message = Message.objects.create(
+            message = Message(
                 conversation=conversation,
                 sender=user,
                 message_type='PATIENT',
@@ -131,41 +234,33 @@ To continue, reply:
                 media_type=media_type,
                 delivery_status='DELIVERED'
             )
+            self._defer_create(message)
             
-            # Step 4: Log action
-            AuditLog.objects.create(
+            self._defer_create(AuditLog(
                 user=user,
                 action_type='MESSAGE_RECEIVED',
                 resource_type='Message',
                 resource_id=str(message.id),
                 description=f"Patient sent message: {message_body[:100]}"
-            )
+            ))
             
             # Step 5: Route based on conversation status
-            if conversation.status == 'INITIAL':
-                self._send_welcome_screen(user, conversation)
-            
-            elif conversation.status == 'AWAITING_ACCEPTANCE':
-                self._handle_acceptance(user, conversation, message_body)
-            
-            elif conversation.status == 'AWAITING_PATIENT_PROFILE':
-                self._handle_profile_collection(user, conversation, message_body)
-            
-            elif conversation.status == 'AI_TRIAGE_IN_PROGRESS':
-                self._handle_triage_response(user, conversation, message_body)
-            
-            elif conversation.status == 'PENDING_CLINICIAN_REVIEW':
-                self._handle_pending_review(user, conversation, message_body)
-            
-            elif conversation.status == 'DIRECT_MESSAGING':
-                self._handle_direct_message(user, conversation, message_body)
+            route = (
+                self.COMMAND_ROUTES.get((conversation.status, message_body.upper()))
+                or self.STATUS_ROUTES.get(conversation.status)
+            )
+            if route:
+                getattr(self, route)(user, conversation, message_body)
             
             return True
             
         except Exception as e:
-            logger.exception(f"Error processing message from {whatsapp_id}")
+            logger.exception("Error processing message from %s", whatsapp_id)
             return False
         
+        finally:
+            self._flush_writes()
+        
     
     # method to handle package selection
     def _handle_package_selection(self, user, message_body):
@@ -174,12 +269,12 @@ To continue, reply:
         If yes, sends the payment link and returns True.
         """
         try:
-            msg_clean = message_body.strip().lower()
+            msg_clean = message_body.strip()
             
             # Only trigger if input is a digit (1, 2, 3)
             if msg_clean.isdigit():
                 idx = int(msg_clean) - 1
-                packages = list(CreditPackage.objects.all().order_by('price'))
+                packages = CreditPackage.ordered_by_price()
                 
                 # Check if it matches a valid package index
                 if 0 <= idx < len(packages):
@@ -190,51 +285,31 @@ To continue, reply:
             return False # Not a payment selection, continue normal flow
             
         except Exception as e:
-            logger.error(f"Package selection error: {e}")
+            logger.error("Package selection error: %s", e)
             return False    
     
     
-    # ✅ Updated _transcribe_audio method
-    from requests.auth import HTTPBasicAuth
-
-
-
-    def _transcribe_audio(self, media_url):
-        print("🎧 Downloading voice note from Twilio...")
-
+    def _transcribe_audio(self, media_url, media_type=None):
         try:
-            response = requests.get(
-                media_url,
-                auth=(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN),
-                timeout=15
-            )
-            response.raise_for_status()
+            audio_bytes = self.twilio.download_media(media_url)
+            logger.debug("Voice note downloaded (%d bytes)", len(audio_bytes))
 
-            audio_bytes = response.content
-            print(f"✅ Audio downloaded ({len(audio_bytes)} bytes)")
-
-            print("🎧 Sending audio to Groq Whisper...")
-            transcription = self.groq.transcribe_audio(media_url)
-
-
-            print(f"📝 Transcription result: {transcription}")
+            # Whisper reads the format from the upload's file extension
+            extension = self.AUDIO_EXTENSIONS.get((media_type or '').split(';')[0].strip(), 'ogg')
+            transcription = self.groq.transcribe_audio_from_bytes(audio_bytes, filename=f"voice.{extension}")
+            logger.debug("Transcription result: %s", transcription)
             return transcription.strip()
 
-        except Exception as e:
-            print("❌ Voice transcription failed")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Voice transcription failed")
             return ""
 
     def _normalize_transcription(self, transcription: str) -> str:
         """Normalize transcription text for consistent processing."""
         if not transcription:
             return ""
-        # Lowercase
-        transcription = transcription.lower()
-        # Remove punctuation
-        transcription = transcription.translate(str.maketrans('', '', string.punctuation))
-        return transcription.strip()
+        # Lowercase and strip punctuation
+        return transcription.lower().translate(_PUNCT_TABLE).strip()
 
 
     # Rest of your code remains the same
@@ -242,20 +317,27 @@ To continue, reply:
         """Auto-register patient if first time."""
         try:
             phone = whatsapp_id.replace('whatsapp:', '')
-            user = User.objects.filter(phone_number=phone).first()
-            if not user:
-                username = f"patient_{phone.replace('+', '')}"
-                user = User.objects.create_user(
-                    username=username,
-                    phone_number=phone,
-                    whatsapp_id=whatsapp_id,
-                    role='PATIENT'
-                )
-                PatientProfile.objects.create(user=user)
+            users = User.objects.select_related('patient_profile')
+            user = users.filter(phone_number=phone).first()
+            if user:
+                return user, False
+            
+            # User and profile commit together; if a concurrent webhook for
+            # the same number wins the insert, use the row it created
+            try:
+                with transaction.atomic():
+                    user = User.objects.create_user(
+                        username=f"patient_{phone.replace('+', '')}",
+                        phone_number=phone,
+                        whatsapp_id=whatsapp_id,
+                        role='PATIENT'
+                    )
+                    PatientProfile.objects.create(user=user)
                 return user, True
-            return user, False
+            except IntegrityError:
+                return users.get(phone_number=phone), False
         except Exception as e:
-            print(f"Error in _get_or_create_user: {str(e)}")
+            logger.error("Error in _get_or_create_user: %s", e)
             return None, False
     
     # ... rest of your methods remain unchanged
@@ -263,11 +345,23 @@ To continue, reply:
     
     def _get_or_create_conversation(self, user):
         """Get active conversation or create new one."""
-        conversation = ConversationSession.objects.filter(
-            patient=user,
-            status__in=['INITIAL', 'AWAITING_ACCEPTANCE', 'AWAITING_PATIENT_PROFILE',
-                       'AI_TRIAGE_IN_PROGRESS', 'PENDING_PAYMENT', 'PENDING_CLINICIAN_REVIEW', 'DIRECT_MESSAGING']
-        ).first()
+        # Review and direct-messaging replies go through assigned_clinician
+        sessions = ConversationSession.objects.select_related('assigned_clinician')
+        conversation = None
+        
+        # Primary-key lookup via the cached active id; status is re-checked
+        # in case the row was changed by a queryset update()
+        active_id = cache.get(ConversationSession.active_cache_key(user.id))
+        if active_id:
+            conversation = sessions.filter(
+                pk=active_id, status__in=ConversationSession.ACTIVE_STATUSES
+            ).first()
+        
+        if not conversation:
+            conversation = sessions.filter(
+                patient=user,
+                status__in=ConversationSession.ACTIVE_STATUSES
+            ).first()
         
         if not conversation:
             conversation = ConversationSession.objects.create(
@@ -275,27 +369,76 @@ To continue, reply:
                 status='INITIAL'
             )
         
+        # Share the already-loaded user (and its profile) instead of
+        # fetching the patient again through the conversation
+        conversation.patient = user
         return conversation
     
-    def _send_welcome_screen(self, user, conversation):
+    def _reply(self, user, conversation, text, message_type='SYSTEM'):
+        """
+        Send `text` to the patient and record it as an outbound Message.
+        
+        This blocks until Twilio has accepted the message, so consecutive
+        replies reach the patient in order; the send is synchronous. The
+        pool only lets a Message row saved outside process_incoming_message
+        be inserted on this thread (which owns the DB connection) while the
+        send is in flight. Inside process_incoming_message the row is just
+        buffered for _flush_writes, and the pool adds nothing but a thread hop.
+        
+        Returns:
+            str: Twilio message SID, or None if sending failed
+        """
+        sent = _SEND_POOL.submit(self.twilio.send_message, user.whatsapp_id, text)
+        self._defer_create(Message(
+            conversation=conversation,
+            sender=None,
+            message_type=message_type,
+            content=text,
+            delivery_status='SENT'
+        ))
+        return sent.result()
+    
+    def _defer_create(self, instance):
+        """
+        Queue a new row for the bulk insert at the end of the webhook.
+        
+        Only for rows nothing reads back during the same message. Outside
+        process_incoming_message the row is saved immediately.
+        """
+        pending = getattr(_pending_writes, 'objects', None)
+        if pending is None:
+            instance.save()
+        else:
+            pending.append(instance)
+    
+    def _flush_writes(self):
+        """Insert the rows queued by _defer_create, one bulk_create per model."""
+        pending = getattr(_pending_writes, 'objects', None)
+        _pending_writes.objects = None
+        if not pending:
+            return
+        
+        by_model = {}
+        for instance in pending:
+            by_model.setdefault(type(instance), []).append(instance)
+        
+        # A failure propagates, so the task fails and is logged rather than
+        # silently losing the inbound message and its audit trail
+        with transaction.atomic():
+            for model, instances in by_model.items():
+                model.objects.bulk_create(instances)
+    
+    def _send_welcome_screen(self, user, conversation, message_body=None):
         """Send welcome message with user agreement."""
         try:
-            self.twilio.send_message(user.whatsapp_id, self.WELCOME_MESSAGE)
-            
             conversation.status = 'AWAITING_ACCEPTANCE'
-            conversation.save()
+            conversation.save(update_fields=['status', 'updated_at'])
             
-            Message.objects.create(
-                conversation=conversation,
-                sender=None,
-                message_type='SYSTEM',
-                content=self.WELCOME_MESSAGE,
-                delivery_status='SENT'
-            )
+            self._reply(user, conversation, self.WELCOME_MESSAGE)
             
-            logger.info(f"Welcome screen sent to {user.phone_number}")
+            logger.info("Welcome screen sent to %s", user.phone_number)
         except Exception as e:
-            print(f"Error sending welcome screen: {str(e)}")
+            logger.error("Error sending welcome screen: %s", e)
     
     def _check_consultation_payment(self, user, conversation):
         """
@@ -316,10 +459,10 @@ To continue, reply:
         if profile.consultation_credits > 0:
             # ✅ HAS CREDITS: Deduct 1 and Unlock
             profile.consultation_credits -= 1
-            profile.save()
+            profile.save(update_fields=['consultation_credits', 'updated_at'])
             
             conversation.is_paid = True
-            conversation.save()
+            conversation.save(update_fields=['is_paid', 'updated_at'])
             
             # self.twilio.send_message(
             #     user.whatsapp_id, 
@@ -331,10 +474,10 @@ To continue, reply:
         # 4. ⛔ NO CREDITS: Handle Payment Flow
         
         # Did user select a package number? (e.g. "2")
-        packages = list(CreditPackage.objects.all().order_by('price'))
+        packages = CreditPackage.ordered_by_price()
         selected_pkg = None
         
-        msg_clean = self.incoming_data.get('Body', '').strip().lower()
+        msg_clean = self.incoming_data.get('Body', '').strip()
         if msg_clean.isdigit():
             idx = int(msg_clean) - 1
             if 0 <= idx < len(packages):
@@ -350,6 +493,10 @@ To continue, reply:
         return False
 
     def _send_credit_menu(self, user, packages):
+        self.twilio.send_message(user.whatsapp_id, self._credit_menu_text(packages))
+
+    def _credit_menu_text(self, packages):
+        """Numbered credit-package menu; the reply number selects a package."""
         msg = "🔒 *CONSULTATION CREDITS REQUIRED*\n\n"
         msg += "You have 0 credits. Please purchase a bundle to start a consultation:\n\n"
         
@@ -362,7 +509,7 @@ To continue, reply:
             msg += "\n"
             
         msg += "👇 *Reply with the number* (e.g., 2) to purchase."
-        self.twilio.send_message(user.whatsapp_id, msg)
+        return msg
 
     def _send_payment_link(self, user, pkg):
         tx_ref = f"PKG-{user.id}-{uuid.uuid4().hex[:8]}"
@@ -376,8 +523,7 @@ To continue, reply:
             status='PENDING'
         )
         
-        flutterwave = FlutterwaveService()
-        link = flutterwave.initialize_payment(user, pkg.price, tx_ref)
+        link = self.flutterwave.initialize_payment(user, pkg.price, tx_ref)
         
         if link:
             self.twilio.send_message(
@@ -388,101 +534,63 @@ To continue, reply:
         else:
             self.twilio.send_message(user.whatsapp_id, "Error generating link.")
     
-    def _handle_acceptance(self, user, conversation, message_body):
-        """Handle user agreement acceptance."""
-        if message_body.upper() == 'GET STARTED':
-            user.terms_accepted = True
-            user.terms_accepted_at = timezone.now()
-            user.save()
-            
-            conversation.status = 'AWAITING_PATIENT_PROFILE'
-            conversation.save()
-            
-            # Ask for age
-            self.twilio.send_message(user.whatsapp_id, self.PROFILE_QUESTIONS['age'])
-            
-            Message.objects.create(
-                conversation=conversation,
-                sender=None,
-                message_type='SYSTEM',
-                content=self.PROFILE_QUESTIONS['age'],
-                delivery_status='SENT'
-            )
-            
-            logger.info(f"User {user.phone_number} accepted terms")
+    def _accept_terms(self, user, conversation, message_body):
+        """Record the user agreement and start profile collection."""
+        user.terms_accepted = True
+        user.terms_accepted_at = timezone.now()
+        user.save(update_fields=['terms_accepted', 'terms_accepted_at', 'updated_at'])
         
-        elif message_body.upper() == 'DECLINE':
-            conversation.status = 'CLOSED'
-            conversation.closed_at = timezone.now()
-            conversation.save()
-            
-            self.twilio.send_message(
-                user.whatsapp_id,
-                "Thank you for your interest. If you change your mind, feel free to reach out anytime."
-            )
-            logger.info(f"User {user.phone_number} declined terms")
+        conversation.status = 'AWAITING_PATIENT_PROFILE'
+        conversation.save(update_fields=['status', 'updated_at'])
+        
+        # Ask for age
+        self._reply(user, conversation, self.PROFILE_QUESTIONS['age'])
+        
+        logger.info("User %s accepted terms", user.phone_number)
+    
+    def _decline_terms(self, user, conversation, message_body):
+        """Close the conversation when the user declines the agreement."""
+        conversation.status = 'CLOSED'
+        conversation.closed_at = timezone.now()
+        conversation.save(update_fields=['status', 'closed_at', 'updated_at'])
+        
+        self.twilio.send_message(
+            user.whatsapp_id,
+            "Thank you for your interest. If you change your mind, feel free to reach out anytime."
+        )
+        logger.info("User %s declined terms", user.phone_number)
     
     def _handle_profile_collection(self, user, conversation, message_body):
         """Collect patient age and gender."""
         try:
             profile = user.patient_profile
             
-            # Check if we have age
-            if not profile.age:
-                try:
-                    age = int(message_body)
-                    if 0 < age < 150:
-                        profile.age = age
-                        profile.save()
-                        
-                        # Ask for gender
-                        self.twilio.send_message(user.whatsapp_id, self.PROFILE_QUESTIONS['gender'])
-                        Message.objects.create(
-                            conversation=conversation,
-                            sender=None,
-                            message_type='SYSTEM',
-                            content=self.PROFILE_QUESTIONS['gender'],
-                            delivery_status='SENT'
-                        )
-                        return
-                except ValueError:
-                    self.twilio.send_message(user.whatsapp_id, "Please enter a valid age (number)")
-                    return
-            
-            # Check if we have gender
-            if not profile.gender:
-                gender_map = {'MALE': 'MALE', 'FEMALE': 'FEMALE', 'OTHER': 'OTHER'}
-                gender_input = message_body.upper()
+            # Fill the first missing profile field, then ask for the next one
+            for field, parser, next_question, error_message in self.PROFILE_STEPS:
+                if getattr(profile, field):
+                    continue
                 
-                if gender_input in gender_map:
-                    profile.gender = gender_map[gender_input]
-                    profile.save()
-                    
-                    # Ask for chief complaint
-                    self.twilio.send_message(user.whatsapp_id, self.PROFILE_QUESTIONS['chief_complaint'])
-                    Message.objects.create(
-                        conversation=conversation,
-                        sender=None,
-                        message_type='SYSTEM',
-                        content=self.PROFILE_QUESTIONS['chief_complaint'],
-                        delivery_status='SENT'
-                    )
-                    return
-                else:
-                    self.twilio.send_message(user.whatsapp_id, "Please reply: Male, Female, or Other")
+                value = getattr(self, parser)(message_body)
+                if value is None:
+                    self.twilio.send_message(user.whatsapp_id, error_message)
                     return
+                
+                setattr(profile, field, value)
+                profile.save(update_fields=[field, 'updated_at'])
+                self._reply(user, conversation, self.PROFILE_QUESTIONS[next_question])
+                return
             
             # If we have age and gender, process chief complaint
             if message_body and len(message_body) > 3:
                 
-                if message_body.lower() in ['hi', 'hello', 'hey']:
+                if message_body.lower() in self.GREETINGS:
                     self.twilio.send_message(user.whatsapp_id, self.PROFILE_QUESTIONS['chief_complaint'])
                     return
                 
                 
                 conversation.chief_complaint = message_body
                 conversation.status = 'AI_TRIAGE_IN_PROGRESS'
-                conversation.save()
+                conversation.save(update_fields=['chief_complaint', 'status', 'updated_at'])
                 
                 # Check for red flags
                 if self._check_red_flags(message_body):
@@ -497,23 +605,34 @@ To continue, reply:
                  self.twilio.send_message(user.whatsapp_id, "Please describe your symptoms in a bit more detail.")
         
         except Exception as e:
-            print(f"Error in profile collection: {str(e)}")
+            logger.error("Error in profile collection: %s", e)
             self.twilio.send_message(user.whatsapp_id, "An error occurred. Please try again.")
     
+    @staticmethod
+    def _parse_age(text):
+        """Return the age in `text`, or None if it isn't a plausible age."""
+        try:
+            age = int(text)
+        except ValueError:
+            return None
+        return age if 0 < age < 150 else None
+    
+    @classmethod
+    def _parse_gender(cls, text):
+        """Return the PatientProfile gender for `text`, or None."""
+        gender = text.upper()
+        return gender if gender in cls.VALID_GENDERS else None
+    
     def _check_red_flags(self, text):
         """Check if message contains red flag keywords."""
-        text_lower = text.lower()
-        return any(keyword in text_lower for keyword in settings.RED_FLAG_KEYWORDS)
+        return RED_FLAG in classify(text)
     
     def _handle_escalation(self, user, conversation, trigger_text):
         """Handle escalation and notify clinician"""
         
-        from apps.escalations.models import EscalationAlert
-        from apps.clinician.whatsapp_handler import ClinicianWhatsAppHandler
-        
         conversation.is_escalated = True
         conversation.status = 'ESCALATED'
-        conversation.save()
+        conversation.save(update_fields=['is_escalated', 'status', 'updated_at'])
         
         escalation = EscalationAlert.objects.create(
             conversation=conversation,
@@ -524,8 +643,7 @@ To continue, reply:
         
         # Notify assigned clinician
         if conversation.assigned_clinician:
-            handler = ClinicianWhatsAppHandler()
-            handler.notify_escalation(conversation.assigned_clinician, escalation)
+            get_clinician_handler().notify_escalation(conversation.assigned_clinician, escalation)
     
     def _start_ai_triage(self, user, conversation):
         """Start AI-based triage questions."""
@@ -538,8 +656,8 @@ To continue, reply:
                 chief_complaint=conversation.chief_complaint
             )
             
-            # Save question
-            triage_q = TriageQuestion.objects.create(
+            # Save question (not buffered: the first answer looks it up)
+            TriageQuestion.objects.create(
                 conversation=conversation,
                 question_text=question,
                 question_type='OPEN_ENDED',
@@ -547,25 +665,36 @@ To continue, reply:
             )
             
             # Send to patient
-            self.twilio.send_message(user.whatsapp_id, question)
-            Message.objects.create(
-                conversation=conversation,
-                sender=None,
-                message_type='AI_QUERY',
-                content=question,
-                delivery_status='SENT'
-            )
+            self._reply(user, conversation, question, message_type='AI_QUERY')
             
             conversation.ai_questions_asked = 1
-            conversation.save()
+            conversation.save(update_fields=['ai_questions_asked', 'updated_at'])
             
-            logger.info(f"Triage started for {user.phone_number}")
+            logger.info("Triage started for %s", user.phone_number)
         except Exception as e:
-            print(f"Error starting triage: {str(e)}")
+            logger.error("Error starting triage: %s", e)
             self.twilio.send_message(user.whatsapp_id, "An error occurred. Please try again later.")
     
     def _handle_triage_response(self, user, conversation, message_body):
-        """Process triage question response."""
+        """
+        Process triage question response.
+        
+        Only one turn per conversation runs at a time. A second message that
+        arrives mid-turn is not treated as an answer; the patient is asked
+        to resend it once the next question arrives.
+        """
+        lock_key = self.TRIAGE_LOCK_KEY.format(conversation.id)
+        if not cache.add(lock_key, 1, self.TRIAGE_LOCK_TIMEOUT):
+            logger.info("Triage turn already running for %s, deferring message", conversation.id)
+            self._reply(user, conversation, self.TRIAGE_BUSY_MESSAGE)
+            return
+        try:
+            self._process_triage_answer(user, conversation, message_body)
+        finally:
+            cache.delete(lock_key)
+    
+    def _process_triage_answer(self, user, conversation, message_body):
+        """Record a triage answer, then ask the next question or start the assessment."""
         try:
             # ✅ GUARD CLAUSE: Check for empty message
             if not message_body or message_body.strip() == "":
@@ -575,77 +704,89 @@ To continue, reply:
                 )
                 return
             
-            # Get last unanswered question
-            last_question = conversation.triage_questions.filter(
-                response_processed=False
-            ).order_by('question_order').first()
+            # Load the transcript once: it gives both the question being
+            # answered and the history for the next-question prompt
+            questions = list(conversation.triage_questions.only(
+                'question_text', 'patient_response', 'response_processed', 'question_order'
+            ).order_by('question_order'))
+            last_question = next((q for q in questions if not q.response_processed), None)
             
             if last_question:
                 last_question.patient_response = message_body
                 last_question.response_timestamp = timezone.now()
                 last_question.response_processed = True
-                last_question.save()
+                last_question.save(update_fields=['patient_response', 'response_timestamp', 'response_processed', 'updated_at'])
             
-            conversation.ai_questions_asked += 1
+            # Atomic increment, so concurrent turns can't lose a count
+            ConversationSession.objects.filter(pk=conversation.pk).update(
+                ai_questions_asked=F('ai_questions_asked') + 1,
+                updated_at=timezone.now(),
+            )
+            conversation.refresh_from_db(fields=['ai_questions_asked'])
             
             # Check if we've asked enough questions
             if conversation.ai_questions_asked >= settings.MAX_TRIAGE_QUESTIONS:
-                self._generate_assessment(user, conversation)
+                if AIAssessment.objects.filter(conversation=conversation).exists():
+                    # Already assessed and waiting on payment; a second
+                    # assessment would only hit the one-per-conversation constraint
+                    self._send_credit_menu(user, CreditPackage.ordered_by_price())
+                    return
+                
+                # The assessment is the slowest Groq call; run it on a worker
+                # and tell the patient it's coming, so the wait isn't silent.
+                self._reply(user, conversation, self.ASSESSMENT_PENDING_MESSAGE)
+                queued_key = self.ASSESSMENT_QUEUED_KEY.format(conversation.id)
+                if cache.add(queued_key, 1, self.ASSESSMENT_QUEUED_TIMEOUT):
+                    generate_and_send_assessment.delay(str(conversation.id))
             else:
-                # Generate next question
-                try:
-                    next_question = self.ai_engine.generate_next_question(
-                        conversation=conversation,
-                        current_response=message_body
-                    )
-                    
-                    # ✅ CRITICAL VALIDATION: Check if AI returned a valid question
-                    if not next_question or not next_question.strip():
-                        print("❌ AI returned empty question - using fallback")
-                        next_question = "Can you tell me more about your symptoms? Any other details that might help?"
-                    
-                    # Now safe to save to database
-                    triage_q = TriageQuestion.objects.create(
-                        conversation=conversation,
-                        question_text=next_question,
-                        question_type='OPEN_ENDED',
-                        question_order=conversation.ai_questions_asked + 1
-                    )
-                    
-                    self.twilio.send_message(user.whatsapp_id, next_question)
-                    Message.objects.create(
-                        conversation=conversation,
-                        sender=None,
-                        message_type='AI_QUERY',
-                        content=next_question,
-                        delivery_status='SENT'
-                    )
-                    
-                except Exception as ai_error:
-                    print(f"❌ AI question generation failed: {str(ai_error)}")
-                    # Use fallback question
-                    fallback_question = "Thank you. Can you describe any other symptoms you're experiencing?"
-                    
-                    triage_q = TriageQuestion.objects.create(
-                        conversation=conversation,
-                        question_text=fallback_question,
-                        question_type='OPEN_ENDED',
-                        question_order=conversation.ai_questions_asked + 1
-                    )
-                    
-                    self.twilio.send_message(user.whatsapp_id, fallback_question)
-                    Message.objects.create(
-                        conversation=conversation,
-                        sender=None,
-                        message_type='AI_QUERY',
-                        content=fallback_question,
-                        delivery_status='SENT'
-                    )
-            
-            conversation.save()
+                # Generate next question; any failure falls back to a generic one
+                empty_key = self.EMPTY_QUESTION_KEY.format(conversation.id)
+                empty_count = cache.get(empty_key, 0)
+                
+                if empty_count >= self.EMPTY_QUESTION_LIMIT:
+                    # The AI keeps coming back empty for this conversation;
+                    # finish triage from the scripted questions instead.
+                    next_question = self.ai_engine.fallback.get_next_question(conversation.ai_questions_asked)
+                else:
+                    try:
+                        next_question = self.ai_engine.generate_next_question(
+                            conversation=conversation,
+                            current_response=message_body,
+                            qa_pairs=[
+                                (q.question_text, q.patient_response)
+                                for q in questions if q.response_processed
+                            ],
+                        )
+                        
+                        # ✅ CRITICAL VALIDATION: Check if AI returned a valid question
+                        if not next_question or not next_question.strip():
+                            logger.warning("AI returned empty question - using fallback")
+                            next_question = self.EMPTY_QUESTION_FALLBACK
+                            cache.set(empty_key, empty_count + 1, self.EMPTY_QUESTION_TIMEOUT)
+                        elif empty_count:
+                            cache.delete(empty_key)
+                    except Exception as ai_error:
+                        logger.warning("AI question generation failed: %s", ai_error)
+                        next_question = self.NEXT_QUESTION_FALLBACK
+                
+                # Written now, not buffered: the next turn looks this row up
+                TriageQuestion.objects.create(
+                    conversation=conversation,
+                    question_text=next_question,
+                    question_type='OPEN_ENDED',
+                    question_order=conversation.ai_questions_asked + 1
+                )
+                
+                self._reply(user, conversation, next_question, message_type='AI_QUERY')
+                
+                # Last question sent: start the assessment on a worker now,
+                # so it is usually ready by the time the patient answers.
+                if (conversation.ai_questions_asked + 1 >= settings.MAX_TRIAGE_QUESTIONS
+                        and not settings.CELERY_TASK_ALWAYS_EAGER):
+                    prefetch_assessment.delay(str(conversation.id))
             
         except Exception as e:
-            print(f"Error handling triage response: {str(e)}")
+            logger.error("Error handling triage response: %s", e)
             self.twilio.send_message(user.whatsapp_id, "An error occurred. Please try again.")
             
     def _generate_assessment(self, user, conversation):
@@ -655,32 +796,40 @@ To continue, reply:
         If user has NO credits -> Show 'Locked' summary & Ask for Payment.
         """
         try:
-            # 1. Generate Assessment from AI
+            profile = user.patient_profile
+            
+            # 1. Generate Assessment from AI, checking its shape once
             assessment_json = self.ai_engine.generate_assessment(conversation)
+            try:
+                result = AssessmentResult.model_validate(assessment_json)
+            except ValidationError:
+                logger.warning("Unusable assessment for %s, using fallback", conversation.id)
+                result = AssessmentResult.model_validate(
+                    self.ai_engine.fallback.get_assessment(conversation.chief_complaint, profile)
+                )
             
             # 2. Save to Database (Status = PENDING_PAYMENT)
             assessment = AIAssessment.objects.create(
                 conversation=conversation,
                 patient=user,
-                patient_age=user.patient_profile.age,
-                patient_gender=user.patient_profile.gender,
+                patient_age=profile.age,
+                patient_gender=profile.gender,
                 chief_complaint=conversation.chief_complaint,
-                symptoms_overview=assessment_json.get('symptoms_overview', {}),
-                key_observations=assessment_json.get('key_observations', {}),
-                preliminary_recommendations=assessment_json.get('preliminary_recommendations', {}),
-                otc_suggestions=assessment_json.get('otc_suggestions', {}),
-                monitoring_advice=assessment_json.get('monitoring_advice', {}),
-                red_flags_detected=assessment_json.get('red_flags_detected', []),
-                confidence_score=assessment_json.get('confidence_score', 0.0),
+                symptoms_overview=result.symptoms_overview,
+                key_observations=result.key_observations,
+                preliminary_recommendations=result.preliminary_recommendations,
+                otc_suggestions=result.otc_suggestions,
+                monitoring_advice=result.monitoring_advice,
+                red_flags_detected=result.red_flags_detected,
+                confidence_score=result.confidence_score or 0.0,
                 status='PENDING_PAYMENT' 
             )
             
             # 3. Check Credits to Decide Path
-            profile = user.patient_profile
             
             if profile.consultation_credits > 0:
                 # ✅ PATH A: HAS CREDITS (Instant Unlock)
-                logger.info(f"User {user.phone_number} has credits. Unlocking immediately.")
+                logger.info("User %s has credits. Unlocking immediately.", user.phone_number)
                 
                 # First, send the nice summary
                 patient_msg = self._format_patient_summary(assessment, conversation)
@@ -692,30 +841,25 @@ To continue, reply:
                 
             else:
                 # ⛔ PATH B: NO CREDITS (Paywall)
-                logger.info(f"User {user.phone_number} has 0 credits. Pausing for payment.")
+                logger.info("User %s has 0 credits. Pausing for payment.", user.phone_number)
                 
                 # Update conversation status to reflect waiting
                 # We keep it as AI_TRIAGE_IN_PROGRESS or switch to a holding state
-                conversation.save()
-                
-                # Send Teaser Message
-                msg = "✅ *ASSESSMENT COMPLETE*\n\n"
-                msg += "We have analyzed your symptoms.\n"
-                msg += "To unlock your full results and have a doctor review your case, please use a credit.\n\n"
-                msg += "🔒 *Balance: 0 Credits*\n"
-                msg += "👇 *Select a package to unlock:*"
-                
-                self.twilio.send_message(user.whatsapp_id, msg)
+                conversation.save(update_fields=['updated_at'])
                 
-                # Show Payment Menu
-                packages = list(CreditPackage.objects.all().order_by('price'))
-                self._send_credit_menu(user, packages)
+                # Send Teaser Message and Payment Menu together (one Twilio
+                # request, and they can't arrive out of order)
+                packages = CreditPackage.ordered_by_price()
+                self.twilio.send_message(
+                    user.whatsapp_id,
+                    f"{self.ASSESSMENT_LOCKED_MESSAGE}\n\n{self._credit_menu_text(packages)}"
+                )
                 
                 # We DO NOT assign a clinician yet. 
                 # The Webhook/SuccessView will call finalize_consultation_flow() later.
 
         except Exception as e:
-            logger.error(f"Error generating assessment: {str(e)}")
+            logger.error("Error generating assessment: %s", e)
             self.twilio.send_message(user.whatsapp_id, "An error occurred generating your results. Please try again later.")
 
     def _format_patient_summary(self, assessment, conversation):
@@ -743,13 +887,13 @@ To continue, reply:
             
             # Severity Text logic
             severity_score = symptoms_data.get('severity_rating', 5)
-            try:
+            if isinstance(severity_score, (int, float)):
                 score = int(severity_score)
-                if score <= 3: severity_text = "mild"
-                elif score <= 7: severity_text = "moderate"
-                else: severity_text = "high"
-            except:
-                severity_text = "moderate"
+            elif str(severity_score).strip().isdigit():
+                score = int(severity_score)
+            else:
+                score = 5
+            severity_text = self.SEVERITY_LABELS[min(max(score, 0), 10)]
 
             # Context/Notes (Extract first sentence of notes if available)
             context_note = ""
@@ -765,26 +909,16 @@ To continue, reply:
                         context_note = f" ({clean_note})"
 
             # 2. Build the Narrative Message
-            # "Hey, looks like you've got a [Condition] going on 😷."
-            msg = "📋 *YOUR HEALTH SUMMARY*\n"
-            msg += "_(To be reviewed by Doctor)_\n\n"
-            msg += f"Hey, looks like you've got a {condition} going on 😷. "
-            
-            # "Symptoms include [A, B, and C] [Context Note] 🤔."
-            msg += f"Symptoms include {symptoms_text}{context_note} 🤔. "
-            
-            # "Severity is [Level] ([Score]/10)."
-            msg += f"Severity is {severity_text} ({severity_score}/10). "
-            
-            # Closing Standard Text
-            msg += "The doctor is reviewing your case and will get back to you with a prescription or advice 💊. \n"
-            msg += "Anything else to add? Just reply to this message, and the doctor will see it."
-            
-
-            return msg
+            return self.PATIENT_SUMMARY_TEMPLATE.format(
+                condition=condition,
+                symptoms_text=symptoms_text,
+                context_note=context_note,
+                severity_text=severity_text,
+                severity_score=severity_score,
+            )
 
         except Exception as e:
-            logger.error(f"Format error: {e}")
+            logger.error("Format error: %s", e)
             # Safe Fallback
             return (
                 "Hey, thanks for sharing that info 😷. "
@@ -796,9 +930,6 @@ To continue, reply:
     def _assign_clinician(self, conversation):
         """Assign clinician and notify them"""
         
-        from apps.clinician.models import ClinicianAvailability, PatientAssignment
-        from apps.clinician.whatsapp_handler import ClinicianWhatsAppHandler
-        
         available = ClinicianAvailability.objects.filter(
             status__in=['AVAILABLE', 'ON_CALL']
         ).order_by('current_patient_count')[:1]
@@ -809,7 +940,7 @@ To continue, reply:
             conversation.assigned_clinician = clinician
             conversation.clinician_assigned_at = timezone.now()
             conversation.status = 'PENDING_CLINICIAN_REVIEW'
-            conversation.save()
+            conversation.save(update_fields=['assigned_clinician', 'clinician_assigned_at', 'status', 'updated_at'])
             
             # Create assignment
             PatientAssignment.objects.create(
@@ -821,21 +952,13 @@ To continue, reply:
             
             # Send WhatsApp notification to clinician
             try:
-                handler = ClinicianWhatsAppHandler()
-                handler.notify_new_patient(clinician, conversation)
+                get_clinician_handler().notify_new_patient(clinician, conversation)
             except Exception as e:
-                print(f"Error notifying clinician: {str(e)}")
+                logger.error("Error notifying clinician: %s", e)
     
     def _handle_pending_review(self, user, conversation, message_body):
         """Handle messages while assessment is pending clinician review."""
-        # Store message for clinician to see
-        Message.objects.create(
-            conversation=conversation,
-            sender=user,
-            message_type='PATIENT',
-            content=message_body,
-            delivery_status='DELIVERED'
-        )
+        # The message itself is already recorded by process_incoming_message
         
         # Ack to patient
         # self.twilio.send_message(
@@ -846,41 +969,44 @@ To continue, reply:
         # Notify clinician that patient added info
         if conversation.assigned_clinician:
             try:
-                from apps.clinician.whatsapp_handler import ClinicianWhatsAppHandler
-                clinician_handler = ClinicianWhatsAppHandler()
-                
-                clinician_handler.notify_patient_message(
+                get_clinician_handler().notify_patient_message(
                     conversation.assigned_clinician, 
                     conversation, 
                     f"Patient added: {message_body}"
                 )
             except Exception as e:
-                logger.error(f"Failed to notify clinician of pending info: {str(e)}")
+                logger.error("Failed to notify clinician of pending info: %s", e)
     
     def _handle_direct_message(self, user, conversation, message_body):
         """Handle direct patient-clinician messaging."""
-        
-        Message.objects.create(
-            conversation=conversation,
-            sender=user,
-            message_type='PATIENT',
-            content=message_body,
-            delivery_status='DELIVERED'
-        )
+        # 1. The message itself is already recorded by process_incoming_message
         
         # 2. Check if a clinician is assigned
         if conversation.assigned_clinician:
-            logger.info(f"New message from patient {user.phone_number} for clinician {conversation.assigned_clinician.phone_number}")
+            logger.info("New message from patient %s for clinician %s", user.phone_number, conversation.assigned_clinician.phone_number)
             
             # Forward message to clinician
             try:
-                from apps.clinician.whatsapp_handler import ClinicianWhatsAppHandler
-                
-                clinician_handler = ClinicianWhatsAppHandler()
-                clinician_handler.notify_patient_message(
+                get_clinician_handler().notify_patient_message(
                     conversation.assigned_clinician, 
                     conversation, 
                     message_body
                 )
             except Exception as e:
-                logger.error(f"Failed to forward message to clinician: {str(e)}")
+                logger.error("Failed to forward message to clinician: %s", e)
+
+
+_handler = None
+
+
+def get_handler():
+    """
+    Return the process-wide MessageHandler, creating it on first use.
+    
+    Building a handler builds its Twilio, Groq and Flutterwave clients;
+    sharing one keeps their HTTP connections warm between messages.
+    """
+    global _handler
+    if _handler is None:
+        _handler = MessageHandler()
+    return _handler
@@ -0,0 +1,112 @@
+"""Celery tasks that take slow Groq work off the webhook request thread."""
+
+import logging
+from celery import shared_task
+from django.core.cache import cache
+from apps.conversations.models import ConversationSession
+
+logger = logging.getLogger('lifegate')
+
+# Twilio MessageSids already queued, so webhook retries aren't handled twice
+SEEN_MESSAGE_KEY = "twilio:sid:{}"
+SEEN_MESSAGE_TIMEOUT = 60 * 60
+
+
+@shared_task(ignore_result=True, queue='whatsapp_incoming')
+def handle_incoming_message(incoming_data):
+    """
+    Route an incoming WhatsApp message to the clinician or patient handler.
+    
+    Runs on a worker so the Twilio webhook can return immediately instead of
+    holding the request open through transcription and Groq calls.
+    
+    Args:
+        incoming_data: dict with From, Body, MediaUrl0, MessageSid from Twilio
+    
+    Returns:
+        bool: Whether the handler processed the message
+    """
+    from apps.authentication.models import User
+    from apps.clinician.whatsapp_handler import get_clinician_handler
+    from services.message_handler import get_handler
+    
+    whatsapp_id = incoming_data.get('From')
+    # Loaded in full so the patient handler can reuse it instead of
+    # looking the sender up again
+    user = User.objects.select_related('patient_profile').filter(whatsapp_id=whatsapp_id).first()
+    
+    if user and user.role == 'CLINICIAN':
+        logger.info("[WEBHOOK] Routing %s to CLINICIAN handler", whatsapp_id)
+        return get_clinician_handler().process_clinician_message(incoming_data)
+    
+    logger.info("[WEBHOOK] Routing %s to PATIENT handler", whatsapp_id)
+    return get_handler().process_incoming_message(incoming_data, user=user)
+
+
+def enqueue_incoming_message(incoming_data):
+    """
+    Queue an incoming message for handling.
+    
+    Voice notes go to the whatsapp_transcription queue, so slow Whisper
+    calls can't hold up plain text messages on whatsapp_incoming. A
+    MessageSid seen in the last hour (a Twilio webhook retry) is dropped.
+    
+    Returns:
+        bool: Whether the message was queued
+    """
+    sid = incoming_data.get('MessageSid')
+    if sid and not cache.add(SEEN_MESSAGE_KEY.format(sid), 1, SEEN_MESSAGE_TIMEOUT):
+        logger.info("[WEBHOOK] Ignoring redelivered message %s", sid)
+        return False
+    
+    queue = 'whatsapp_transcription' if incoming_data.get('MediaUrl0') else 'whatsapp_incoming'
+    try:
+        handle_incoming_message.apply_async(args=[incoming_data], queue=queue)
+    except Exception:
+        # Not queued (e.g. broker down): forget the SID so Twilio's retry
+        # of this webhook is handled instead of dropped as a duplicate
+        if sid:
+            cache.delete(SEEN_MESSAGE_KEY.format(sid))
+        raise
+    return True
+
+
+@shared_task(ignore_result=True)
+def generate_and_send_assessment(conversation_id):
+    """
+    Generate the AI assessment for a finished triage and message the patient.
+    
+    Args:
+        conversation_id: ConversationSession primary key
+    """
+    # Imported here: message_handler enqueues this task
+    from services.message_handler import get_handler
+    
+    try:
+        conversation = ConversationSession.objects.select_related(
+            'patient__patient_profile'
+        ).get(id=conversation_id)
+    except ConversationSession.DoesNotExist:
+        logger.warning("Assessment task: conversation %s no longer exists", conversation_id)
+        return
+    
+    get_handler()._generate_assessment(conversation.patient, conversation)
+
+
+# Only writes the speculative cache entry, so it is safe to run again
+@shared_task(ignore_result=True, acks_late=True, reject_on_worker_lost=True)
+def prefetch_assessment(conversation_id):
+    """
+    Speculatively generate the assessment while the patient answers the
+    last triage question (see AIEngine.prefetch_assessment).
+    
+    Args:
+        conversation_id: ConversationSession primary key
+    """
+    from services.message_handler import get_handler
+    
+    conversation = ConversationSession.objects.select_related(
+        'patient__patient_profile'
+    ).filter(id=conversation_id).first()
+    if conversation is not None:
+        get_handler().ai_engine.prefetch_assessment(conversation)
@@ -1,9 +1,11 @@
 import logging
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 from apps.authentication.models import PatientProfile
 from apps.conversations.models import Message
 from apps.clinician.models import ClinicianAvailability, PatientAssignment
-from apps.clinician.whatsapp_handler import ClinicianWhatsAppHandler
+from apps.clinician.whatsapp_handler import get_clinician_handler
 from integrations.twilio.client import TwilioClient
 
 logger = logging.getLogger('lifegate')
@@ -20,7 +22,7 @@ def finalize_consultation_flow(user, conversation, assessment):
         # 1. Deduct Credit
         if profile.consultation_credits > 0:
             profile.consultation_credits -= 1
-            profile.save()
+            profile.save(update_fields=['consultation_credits', 'updated_at'])
         else:
             # Safety check: Should not happen if called correctly, but handle gracefully
             logger.warning(f"User {user.phone_number} has 0 credits in finalize flow.")
@@ -28,12 +30,12 @@ def finalize_consultation_flow(user, conversation, assessment):
 
         # 2. Update Status
         assessment.status = 'PENDING_REVIEW'
-        assessment.save()
+        assessment.save(update_fields=['status', 'updated_at'])
         
         conversation.status = 'PENDING_CLINICIAN_REVIEW'
         conversation.triage_completed_at = timezone.now()
         conversation.is_paid = True # Lock is effectively open
-        conversation.save()
+        conversation.save(update_fields=['status', 'triage_completed_at', 'is_paid', 'updated_at'])
 
         # 3. Assign Clinician
         _assign_clinician(conversation)
@@ -70,16 +72,36 @@ def finalize_consultation_flow(user, conversation, assessment):
         return False
 
 def _assign_clinician(conversation):
-    """Internal helper to find and assign a doctor."""
-    available = ClinicianAvailability.objects.filter(
+    """
+    Internal helper to find and assign a doctor.
+    
+    The least-loaded clinician's availability row is locked while their
+    patient count is bumped, so concurrent payments spread across
+    clinicians instead of all picking the same one.
+    """
+    candidates = ClinicianAvailability.objects.select_related('clinician').filter(
         status__in=['AVAILABLE', 'ON_CALL']
-    ).order_by('current_patient_count')[:1]
+    ).order_by('current_patient_count')
     
-    if available:
-        clinician = available[0].clinician
+    with transaction.atomic():
+        availability = candidates.select_for_update(skip_locked=True, of=('self',)).first()
+        if availability is None:
+            # Every candidate may be locked by a concurrent assignment;
+            # wait for the least-loaded one rather than skip the patient
+            availability = candidates.select_for_update(of=('self',)).first()
+        
+        if availability is None:
+            logger.warning("No clinician available for conversation %s", conversation.id)
+            return
+        
+        ClinicianAvailability.objects.filter(pk=availability.pk).update(
+            current_patient_count=F('current_patient_count') + 1
+        )
+        
+        clinician = availability.clinician
         conversation.assigned_clinician = clinician
         conversation.clinician_assigned_at = timezone.now()
-        conversation.save()
+        conversation.save(update_fields=['assigned_clinician', 'clinician_assigned_at', 'updated_at'])
         
         PatientAssignment.objects.create(
             patient=conversation.patient,
@@ -87,9 +109,8 @@ def _assign_clinician(conversation):
             conversation=conversation,
             assignment_reason='AUTO_MATCH'
         )
-        
-        try:
-            handler = ClinicianWhatsAppHandler()
-            handler.notify_new_patient(clinician, conversation)
-        except:
-            pass
\ No newline at end of file
+    
+    try:
+        get_clinician_handler().notify_new_patient(clinician, conversation)
+    except Exception as e:
+        logger.error("Error notifying clinician %s: %s", clinician.id, e)
\ No newline at end of file